@@ -4,14 +4,47 @@ Provides functionality for accounting Accounts
 from __future__ import annotations
 
 import re
+import sys
 from datetime import datetime
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+from types import MappingProxyType
+from functools import partial
+from itertools import chain
+from typing import Iterable
 
 
 from pybooks.journal import JournalEntry
 from pybooks.util import InvalidAccountNumberException, DuplicateException
 from pybooks.enums import AccountType
 
+def _digit_matcher(regex:re.Pattern):
+    r'''
+    Most account code regexes are just digits and \d's, like 1\d\d.  For
+    those, return an equivalent check built on str methods so matching a
+    segment value never has to go through the regex engine.
+
+    Only handles a run of literal digits followed by a run of \d's, the
+    caller is expected to have already checked the value's length.  Returns
+    None for anything else.
+    '''
+    match = re.fullmatch(r'(\d*)((?:\\d)*)', regex.pattern)
+    if match is None or regex.flags & re.ASCII:
+        return None
+
+    prefix, wildcards = match.groups()
+    if not wildcards:
+        return prefix.__eq__
+    if not prefix:
+        return str.isdecimal
+    # A partial rather than a lambda so segments can still be pickled
+    return partial(_is_prefixed_decimal, prefix)
+
+def _is_prefixed_decimal(prefix:str, value:str):
+    return value.startswith(prefix) and value[len(prefix):].isdecimal()
+
+# What AccountNumberSegment._regex_meaning() gives when nothing matches
+_NO_MEANING = object()
+
 class AccountNumberSegment:
     '''
     A class to wrap account number segment functionality
@@ -25,7 +58,7 @@ class AccountNumberSegment:
     def __init__(self, name:str, meanings:dict[str|re.Pattern, str],
                  is_regex=False, incrementable=False):
         self.name = name
-        self.meanings = meanings
+        self._meanings = meanings
         self.is_regex = is_regex
         self.length = None
         # Whether this segment is unimportant / temp enough to warrant
@@ -74,6 +107,26 @@ class AccountNumberSegment:
                     raise InvalidAccountNumberException(
                         'Variable length regex detected on Segment!')
 
+            # With several regexes, one alternation of all of them finds the
+            # first that matches in a single pass.  Only for plain patterns
+            # sharing the same flags, groups would change what the others
+            # refer to
+            self._fused = None
+            self._fused_meanings = list(meanings.values())
+            flags = {regex.flags for regex in meanings}
+            if len(meanings) > 1 and len(flags) == 1 \
+                    and not any('(' in regex.pattern for regex in meanings):
+                self._fused = re.compile(
+                    '|'.join(f'({regex.pattern})' for regex in meanings),
+                    flags.pop())
+
+            # Otherwise (match function, meaning) for each regex, see
+            # _regex_meaning()
+            self._matchers = [] if self._fused is not None else [
+                (_digit_matcher(regex) or regex.match, value)
+                for regex, value in meanings.items()
+            ]
+
         
         # Check for uniform meanings lengths
         elif isinstance(meanings, dict):
@@ -84,19 +137,48 @@ class AccountNumberSegment:
                 raise TypeError('Regex segment encountered with no is_regex '
                                 'flag')
             
-            if not all([len(x) == first_len for x in meanings]):
+            if not all(len(x) == first_len for x in meanings):
                 raise ValueError('AccountNumberSegment input dict has '
                     'variable length keys')
 
+        # Segments get shared between templates, keep anyone from changing
+        # the meanings out from under the others
+        if isinstance(meanings, dict):
+            self._meanings = dict(meanings)
 
+    @property
+    def meanings(self):
+        '''
+        The segment's values and their meanings, read-only
+        '''
+        if isinstance(self._meanings, dict):
+            return MappingProxyType(self._meanings)
+        return self._meanings
     
     def __contains__(self, item):
         '''
         Used so we can check if a key is 'in' this Segment
         '''
-        if isinstance(self.meanings, re.Pattern):
-            return self.meanings.fullmatch(item)
-        return item in self.meanings
+        if self.is_regex:
+            return self._regex_meaning(str(item)) is not _NO_MEANING
+        return item in self._meanings
+
+    def _regex_meaning(self, key:str):
+        '''
+        The meaning of the first of the segment's regexes that matches key,
+        or _NO_MEANING
+        '''
+        if len(key) != self.length:
+            return _NO_MEANING
+        if self._fused is not None:
+            match = self._fused.match(key)
+            if match is None:
+                return _NO_MEANING
+            return self._fused_meanings[match.lastindex - 1]
+        for matcher, value in self._matchers:
+            if matcher(key):
+                return value
+        return _NO_MEANING
 
     def __getitem__(self, key):
         '''
@@ -105,12 +187,21 @@ class AccountNumberSegment:
         Throws a KeyError if the number segment is outside the defined range
         for the current segment.
         '''
+        if self.is_regex and len(key) == self.length:
+            meaning = self._regex_meaning(str(key))
+            if meaning is not _NO_MEANING:
+                return meaning
+        return self._meanings[key]
+
+    def get(self, key, default=None):
+        '''
+        Like __getitem__, but returns default for values outside the segment
+        instead of raising a KeyError
+        '''
         if self.is_regex:
-            if len(key) == self.length:
-                for regex, value in self.meanings.items():
-                    if regex.match(str(key)):
-                        return value
-        return self.meanings[key]
+            meaning = self._regex_meaning(str(key))
+            return default if meaning is _NO_MEANING else meaning
+        return self._meanings.get(key, default)
 
 class AccountNumberTemplate:
     '''
@@ -213,13 +304,10 @@ class AccountNumberTemplate:
         # Important that it's zipped so that templates with identical segments
         # in different orders do not match
         for val, seg in zip(number.split(separator), self.segments.values()):
-            try:
-                # seg.__getitem__ is defined to do all the logic here or spit
-                # out a KeyError
-                seg[val]
-            except KeyError:
+            # seg.get() does all the logic here, without raising for the
+            # values that don't fit
+            if seg.get(val, _NO_MEANING) is _NO_MEANING:
                 return False
-            continue
         return True
     
     def _make_account_number(self, **kwargs) -> _AccountNumber:
@@ -318,6 +406,9 @@ class _AccountNumber:
 
         values = number.split(template.separator)
         for seg_name, value in zip(template.segments, values):
+            # The same few segment values ('01', '100') repeat across every
+            # account and get compared by every filter
+            value = sys.intern(value)
             self._dict[seg_name] = value
 
             # Add property access for all segments
@@ -373,7 +464,10 @@ class Account:
         # rules or guidelines
         if not name:
             raise ValueError('Trying to initialize account with an empty name')
-        self.name = name
+        # Names and numbers get compared and used as keys all the time,
+        # interning lets most of those comparisons stop at an identity check.
+        # sys.intern() only takes exact strs
+        self.name = sys.intern(name) if type(name) is str else name
 
         # The number is a strictly templated value that must conform to an
         # AccountNumberTemplate.
@@ -386,13 +480,27 @@ class Account:
 
         # Easy access to a raw string version of the account number
         # formatted with the template's default separator
-        self.number = self._account_number.number
+        number = self._account_number.number
+        self.number = sys.intern(number) if type(number) is str else number
+
+        # How print_journal() labels this account, keyed on
+        # (use_acc_numbers, use_acc_names).  Built once here since neither
+        # the name nor the number change after creation
+        self._journal_labels = {
+            (False, False): '',
+            (True, False): self.number,
+            (False, True): self.name,
+            (True, True): f'{self.number} {self.name}',
+        }
 
         # Either a credit or a debit
         if account_type is None or not isinstance(account_type, AccountType):
             raise ValueError('Trying to create a new account with an invalid '
                              'Account type (must be Credit or Debit)')
         self.account_type = account_type
+        # Balances branch on this constantly, a bool is much cheaper to check
+        # than comparing Enum members
+        self._is_debit = account_type is AccountType.DEBIT
 
         # A set of JournalEntry instances added to whenever this account is
         # involved in a Journal addition
@@ -458,16 +566,9 @@ class Account:
         Return the net balance of the account, depending on whether it is a
         credit or a debit
         '''
-        to_return = self.initial_balance
-
-        if self.account_type == AccountType.CREDIT:
-            to_return += self.gross_credit
-            to_return -= self.gross_debit
-        elif self.account_type == AccountType.DEBIT:
-            to_return += self.gross_debit
-            to_return -= self.gross_credit
-        
-        return to_return
+        if self._is_debit:
+            return self.initial_balance + self.gross_debit - self.gross_credit
+        return self.initial_balance + self.gross_credit - self.gross_debit
 
     @staticmethod
     def net_balance_agg(accounts, report_format):
@@ -538,6 +639,10 @@ class ChartOfAccounts(dict):
     Much TODO here
     '''
     def __init__(self, template:AccountNumberTemplate=None, mapping={}):
+        # Bumped on every change to the chart's contents, see _columns()
+        self._version = 0
+        self._column_cache = None
+        self._hash_cache = None
         super().__init__(mapping)
 
         if template is None:
@@ -562,6 +667,111 @@ class ChartOfAccounts(dict):
             setattr(cls, name, inner)
         for name in names:
             wrap_method_closure(name)
+
+    @classmethod
+    def _wrap_mutating_methods(cls, names):
+        '''
+        Like _wrap_methods(), for the dict builtins that change the chart's
+        contents and so have to invalidate its cached columns
+        '''
+        def wrap_method_closure(name):
+            def inner(self, *args, **kwargs):
+                result = getattr(super(cls, self), name)(*args, **kwargs)
+                self._version += 1
+                return result
+            inner.fn_name = name
+            setattr(cls, name, inner)
+        for name in names:
+            wrap_method_closure(name)
+
+    def _content_hash(self) -> int:
+        '''
+        An order independent hash of the chart's account numbers, cached
+        until the chart next changes.
+
+        Only the keys go in, the accounts themselves can be edited in place
+        without the chart knowing.
+        '''
+        if self._hash_cache is None or self._hash_cache[0] != self._version:
+            content_hash = 0
+            for key in self:
+                content_hash ^= hash(key)
+            self._hash_cache = (self._version, content_hash)
+        return self._hash_cache[1]
+
+    def __eq__(self, other):
+        '''
+        Charts with different account numbers almost always have different
+        hashes, so only compare account by account when the hashes agree
+        '''
+        if isinstance(other, ChartOfAccounts) \
+                and self._content_hash() != other._content_hash():
+            return False
+        return super().__eq__(other)
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def _columns(self) -> tuple[list[Account], dict[str, list]]:
+        '''
+        A column-wise view of the accounts for filtering: (accounts, columns)
+        where columns maps every searchable key (each account number segment
+        name, and 'name') to a list of that value for every account, lined up
+        with accounts.  None marks an account that doesn't have the key.
+
+        Filters only have to scan the columns they care about instead of
+        building a dict for every account.  Rebuilt the first time it is
+        asked for after the chart changes.
+        '''
+        if self._column_cache is not None \
+                and self._column_cache[0] == self._version:
+            return self._column_cache[1:3]
+
+        accounts = list(self.values())
+        columns = {}
+        for i, account in enumerate(accounts):
+            search_items = chain(account._account_number._dict.items(),
+                                 (('name', account.name),))
+            for key, value in search_items:
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = [None] * len(accounts)
+                column[i] = value
+
+        # The last slot holds the inverted indexes, see _column_index()
+        self._column_cache = (self._version, accounts, columns, {})
+        return accounts, columns
+
+    def _column_index(self, key:str, fuzzy=False) -> dict[str, list[int]]|None:
+        '''
+        An inverted index of one of the _columns(): value -> the positions of
+        the accounts with that value.  Built on first use.
+
+        A fuzzy index is keyed on the lowercased values.  It is None if the
+        column has any non-ASCII values since those don't lowercase the same
+        way re.IGNORECASE compares them.
+        '''
+        _, columns = self._columns()
+        indexes = self._column_cache[3]
+
+        index_key = (key, fuzzy)
+        if index_key not in indexes:
+            index = defaultdict(list)
+            for i, value in enumerate(columns[key]):
+                if value is None:
+                    continue
+                if fuzzy:
+                    if not value.isascii():
+                        index = None
+                        break
+                    value = value.lower()
+                index[value].append(i)
+            indexes[index_key] = index
+
+        return indexes[index_key]
     
     def add_account(self, account:Account|str, number:str=None,
                     account_type:AccountType=None):
@@ -596,6 +806,33 @@ class ChartOfAccounts(dict):
         # accounts
         return account
 
+    def add_accounts(self, accounts:Iterable[Account]) -> list[Account]:
+        '''
+        Bulk add_account() for pre-existing Account instances.
+
+        Every account is checked before any of them are added, so if one is
+        rejected the chart is left unchanged.
+        '''
+        accounts = list(accounts)
+        for account in accounts:
+            if not isinstance(account, Account):
+                raise TypeError('add_accounts() only takes Account instances')
+            # Safety Check: The account must have the same template as this
+            # chart
+            if account._account_number.template != self.template:
+                raise ValueError('Trying to add an Account with a different '
+                                 'AccountNumberTemplate')
+
+        numbers = [account.number for account in accounts]
+        new_numbers = set(numbers)
+        if len(new_numbers) != len(numbers) \
+                or not new_numbers.isdisjoint(self.keys()):
+            raise DuplicateException('Trying to add new accounts with '
+                                     'duplicate numbers')
+
+        self.update(zip(numbers, accounts))
+        return accounts
+
     def print_table(self):
         '''
         Prints a visual representation of the accounts contained, listed in
@@ -616,11 +853,14 @@ class ChartOfAccounts(dict):
 
 # Make sure the set wrapper class has all of the builtin set methods
 ChartOfAccounts._wrap_methods([
-    '__class_getitem__', '__contains__', '__delattr__', '__delitem__',
-    '__eq__', '__format__', '__ge__', '__getattribute__', '__getitem__',
-    '__gt__', '__hash__', '__ior__', '__iter__', '__le__', '__len__', '__lt__',
-    '__ne__', '__or__', '__reduce__', '__reduce_ex__', '__repr__',
-    '__reversed__', '__ror__', '__setattr__', '__setitem__', '__sizeof__',
-    'clear', 'copy', 'fromkeys', 'get', 'items', 'keys', 'pop', 'popitem',
-    'setdefault', 'update', 'values'
+    '__class_getitem__', '__contains__', '__delattr__',
+    '__format__', '__ge__', '__getattribute__', '__getitem__',
+    '__gt__', '__hash__', '__iter__', '__le__', '__len__', '__lt__',
+    '__or__', '__reduce__', '__reduce_ex__', '__repr__',
+    '__reversed__', '__ror__', '__setattr__', '__sizeof__',
+    'copy', 'fromkeys', 'get', 'items', 'keys', 'values'
+])
+ChartOfAccounts._wrap_mutating_methods([
+    '__delitem__', '__ior__', '__setitem__', 'clear', 'pop', 'popitem',
+    'setdefault', 'update'
 ])
@@ -3,25 +3,112 @@
 from __future__ import annotations
 
 import math
+import sys
+from bisect import insort
 # "Circular" imports only for type annotations
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from pybooks.account import Account
 
-from collections import defaultdict
+from collections import defaultdict, deque
 from datetime import datetime
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_EVEN, ROUND_HALF_UP
+from functools import lru_cache
+from itertools import chain
+from operator import attrgetter
 
-from pybooks.util import parse_date, normal_round, truncate
+from pybooks.util import parse_date
+
+def _format_date(date, date_format):
+    '''
+    strftime() a journal date, cached since journals repeat the same dates
+    across many entries and across every print
+    '''
+    # The same instant in different time zones compares equal but prints
+    # differently, so only naive dates can share a cache entry
+    if date.tzinfo is None:
+        return _format_naive_date(date, date_format)
+    return datetime.strftime(date, date_format)
+
+@lru_cache(maxsize=4096)
+def _format_naive_date(date, date_format):
+    return datetime.strftime(date, date_format)
+
+def _format_amount(currency, amount):
+    '''
+    Format an amount for display, eg "$5,000".  Cached since real journals
+    are full of repeated round amounts.
+    '''
+    # Equal amounts can still print differently, eg Decimal('5000') and
+    # Decimal('5000.00'), so they are cached under how they are written too
+    return _format_written_amount(currency, amount, str(amount))
+
+@lru_cache(maxsize=8192, typed=True)
+def _format_written_amount(currency, amount, written):
+    '''
+    typed=True keeps 5000 and 5000.0 from sharing a cache entry since they
+    format differently.
+    '''
+    return f'{currency}{amount:,}'
+
+@lru_cache(maxsize=256)
+def _hr(char, width):
+    '''
+    A horizontal rule of char, width long.  Journals keep getting printed at
+    the same widths so these are cached.
+    '''
+    return char * width
+
+_entry_date = attrgetter('date')
+
+def _get_entry_lengths(entry, use_nums, use_names):
+    '''
+    Util function that gets the max length of an account for the
+    printed journal with the optional specified number or name format
+    
+    Returns a 2-tuple: debit_len, credit_len
+    '''
+    label_key = (use_nums, use_names)
+    return (len(entry.acc_debit._journal_labels[label_key]),
+            len(entry.acc_credit._journal_labels[label_key]))
 
 class Journal:
     def __init__(self, currency_symbol='$'):
-        # A dictionary from dates to a list of entries on that date
+        # A dictionary from dates to the entries on that date. Each date's
+        # entries are a deque since they are only ever appended to and
+        # iterated over in order.
         # The combined date+index will mark the journal ID for the transaction
-        self._entries:defaultdict[datetime.datetime, list] = defaultdict(list)
-        self.num_entries = 0
+        self._entries:defaultdict[datetime.datetime, deque] = \
+            defaultdict(deque)
+        # Every entry in one list, kept in chronological order as they are
+        # added (and in the order they were added within a date) so that
+        # printing is a single pass that never has to sort
+        self._entries_flat:list[JournalEntry] = []
+        self._num_entries = 0
         self.accounts:set[Account] = set()
 
         self._currency = currency_symbol
+
+        # Running column widths for print_journal(), updated as entries are
+        # added instead of re-measured on every print.
+        # Widest formatted date per date_format that has been printed with
+        self._date_widths:dict[str, int] = {}
+        # Widest (debit, credit) account labels per (use_acc_numbers,
+        # use_acc_names) combination
+        self._acc_widths:dict[tuple[bool, bool], list[int]] = {
+            (True, False): [0, 0],
+            (False, True): [0, 0],
+            (True, True): [0, 0],
+        }
+        self._amount_width = 0
+
+    @property
+    def num_entries(self):
+        '''
+        The number of entries posted to this journal, maintained as entries
+        are added
+        '''
+        return self._num_entries
     
     def print_journal(self, use_acc_numbers=False, use_acc_names=True,
             date_format='%B %d, %Y', tab_len=4):
@@ -35,142 +122,67 @@ class Journal:
 
         TODO Add support for compound journal entries
         '''
-        def get_entry_lengths(entry, use_nums, use_names):
-            '''
-            Util function that gets the max length of an account for the
-            printed journal with the optional specified number or name format
-            
-            Returns a 2-tuple: debit_len, credit_len
-            '''
-            if not use_nums and not use_names:
-                return (0, 0)
-
-            # In multiplcation bools resolve to 0 or 1
-            debit_len = len(entry.acc_debit.number) * use_nums
-            debit_len += len(entry.acc_debit.name) * use_names
-
-            credit_len = len(entry.acc_credit.number) * use_nums
-            credit_len += len(entry.acc_credit.name) * use_names
-
-            # If name and number are specified put a space between them
-            if use_nums and use_names:
-                debit_len += 1
-                credit_len += 1
-
-            return (debit_len, credit_len)
-        
-        def get_acc_col_length(entry_list, use_nums, use_names, tab_len):
-            '''
-            Get the overall length for the Account Column in the printed table.
-            '''
-            if not use_nums and not use_names:
-                return 0
-
-            to_return = 0
-
-            for entry in entry_list:
-                debit_len, credit_len = \
-                    get_entry_lengths(entry, use_nums, use_names)
-                
-                to_return = max(to_return, debit_len, credit_len + tab_len)
-
-            return to_return 
-
-        # dictionaries keys are unordered
-        dates = sorted(self._entries)
-
         cols = ('Date', 'Account', 'Debit', 'Credit')
-        longest = [0] * len(cols)
-
-        # Get the longest values for each column
-        for date, entry_list in self._entries.items():
-            longest[0] = max(
-                longest[0],
-                len(datetime.strftime(date, date_format))
-            )
-            # max will return the JournalEntry object
-            longest[1] = max(
-                longest[1],
-                get_acc_col_length(entry_list, use_acc_numbers, use_acc_names,
-                                   tab_len)
-            )
-            longest[2] = max(
-                longest[2],
-                len('{}{:,}'.format(
-                    self._currency,
-                    max(entry_list, key=lambda x: x.amount).amount)
-                )
+        use_acc_numbers = bool(use_acc_numbers)
+        use_acc_names = bool(use_acc_names)
+
+        # The column widths are kept up to date as entries are added, so
+        # there is no need to measure every entry here
+        if date_format not in self._date_widths:
+            self._date_widths[date_format] = max(
+                (len(_format_date(date, date_format)) for date in self._entries),
+                default=0
             )
 
-            longest[3] = longest[2]
+        acc_col_len = 0
+        if self.num_entries and (use_acc_numbers or use_acc_names):
+            debit_len, credit_len = \
+                self._acc_widths[(use_acc_numbers, use_acc_names)]
+            acc_col_len = max(debit_len, credit_len + tab_len)
+
+        longest = [
+            self._date_widths[date_format],
+            acc_col_len,
+            self._amount_width,
+            self._amount_width
+        ]
 
         lc = longest
         tab = ' ' * tab_len
-        title_row = (
-            '{0:<{lc[0]}}{tab}'
-            '{1:<{lc[1]}}{tab}'
-            '{2:<{lc[2]}}{tab}'
-            '{3:<{lc[3]}}'
-            .format(*cols, tab=tab,lc=lc)
-        ).strip()
-
-        print(title_row)
-        print('=' * len(title_row))
-        sorted_dates = sorted(self._entries.keys())
-
-        for date in sorted_dates:
-            for entry in self._entries[date]:
-                debit_name = ''
-                credit_name = ''
-                if use_acc_numbers:
-                    debit_name += entry.acc_debit.number
-                    credit_name += entry.acc_credit.number
-
-                    # Add a space only if the name is coming after and
-                    # the name is populated
-                    if use_acc_names:
-                        debit_name += ' '
-                        credit_name += ' '
-                
-                if use_acc_names:
-                    debit_name += entry.acc_debit.name
-                    credit_name += entry.acc_credit.name
-
-                # Print the debit account, and then the credit account
-                print(
-                    '{0:<{lc[0]}}{tab}'
-                    '{1:<{lc[1]}}{tab}'
-                    '{curr}{2:<{lc[2]},}{tab}'
-                    '{3:<{lc[3]}}'
-                    .format(
-                        datetime.strftime(entry.date, date_format),
-                        debit_name,
-                        entry.amount,
-                        '',
-                        lc=lc,
-                        tab=tab,
-                        curr=self._currency
-                    )
-                    .strip()
-                )
-                # Indent the credited account
-                print(
-                    '{0:<{lc[0]}}{tab}'
-                    '{1:<{lc[1]}}{tab}'
-                    '{2:<{lc[2]}}{tab}'
-                    '{curr}{3:<{lc[3]},}'
-                    .format(
-                        '',
-                        tab + credit_name,
-                        '',
-                        entry.amount,
-                        lc=lc,
-                        tab=tab,
-                        curr=self._currency
-                    )
-                    .rstrip()  # Indented with spaces on the left
-                )
-                print('-' * len(title_row))
+        label_key = (use_acc_numbers, use_acc_names)
+        # Bake the column widths into the row format once
+        row_format = (
+            f'{{0:<{lc[0]}}}{tab}'
+            f'{{1:<{lc[1]}}}{tab}'
+            f'{{2:<{lc[2]}}}{tab}'
+            f'{{3:<{lc[3]}}}'
+        )
+        title_row = row_format.format(*cols).strip()
+
+        # Collect every line and write them all at once rather than print()ing
+        # 3 lines per entry
+        separator = _hr('-', len(title_row))
+        lines = [title_row, _hr('=', len(title_row))]
+        for entry in self._entries_flat:
+            debit_name = entry.acc_debit._journal_labels[label_key]
+            credit_name = entry.acc_credit._journal_labels[label_key]
+            amount = _format_amount(self._currency, entry.amount)
+
+            # The debit account, and then the credit account
+            lines.append(
+                row_format.format(_format_date(entry.date, date_format),
+                                  debit_name, amount, '')
+                .strip()
+            )
+            # Indent the credited account
+            lines.append(
+                row_format.format('', tab + credit_name, '', amount)
+                .rstrip()  # Indented with spaces on the left
+            )
+            lines.append(separator)
+
+        lines.append('')
+        sys.stdout.write('\n'.join(lines))
 
     def add_account(self, account):
         '''
@@ -178,16 +190,79 @@ class Journal:
         '''
         self.accounts.add(account)
     
+    def _add_date(self, date):
+        '''
+        Record a date that is new to this journal
+        '''
+        for date_format, width in self._date_widths.items():
+            self._date_widths[date_format] = max(
+                width, len(_format_date(date, date_format)))
+
+    def _update_widths(self, entry):
+        '''
+        Widen the print_journal() columns to fit a newly added entry
+        '''
+        for (use_nums, use_names), widths in self._acc_widths.items():
+            debit_len, credit_len = \
+                _get_entry_lengths(entry, use_nums, use_names)
+            widths[0] = max(widths[0], debit_len)
+            widths[1] = max(widths[1], credit_len)
+
+        self._amount_width = max(
+            self._amount_width,
+            len(_format_amount(self._currency, entry.amount))
+        )
+
     def add_entry(self, entry):
         if not isinstance(entry, JournalEntry):
             raise TypeError('Entry must be a JournalEntry')
+        # insort() goes to the right of equal dates, keeping insertion order.
+        # It goes first since it's the step that can fail, eg comparing naive
+        # and aware dates, and that shouldn't leave the entry half added
+        insort(self._entries_flat, entry, key=_entry_date)
+        if entry.date not in self._entries:
+            self._add_date(entry.date)
         self._entries[entry.date].append(entry)
-        self.num_entries += 1
+        self._num_entries += 1
+        self._update_widths(entry)
 
         # Link all of the entries together
         for account in (entry.acc_credit, entry.acc_debit):
             self.add_account(account)
 
+    def add_entries(self, entries):
+        '''
+        Add an iterable of JournalEntry's to this journal in one go.
+
+        The entries are grouped by date first so that each date's list of
+        entries is extended once rather than appended to entry by entry.
+        Nothing is added if any of the entries is not a JournalEntry or can't
+        be sorted in with the rest.
+        '''
+        by_date = defaultdict(list)
+        for entry in entries:
+            if not isinstance(entry, JournalEntry):
+                raise TypeError('Entry must be a JournalEntry')
+            by_date[entry.date].append(entry)
+
+        # sorted() is stable, so the new entries stay after any existing ones
+        # on the same date and in the order they were given.  Nothing is
+        # recorded until it succeeds, eg comparing naive and aware dates
+        self._entries_flat = sorted(
+            chain(self._entries_flat, chain.from_iterable(by_date.values())),
+            key=_entry_date)
+
+        for date, date_entries in by_date.items():
+            if date not in self._entries:
+                self._add_date(date)
+            self._entries[date].extend(date_entries)
+            self._num_entries += len(date_entries)
+
+            for entry in date_entries:
+                self._update_widths(entry)
+                self.accounts.add(entry.acc_credit)
+                self.accounts.add(entry.acc_debit)
+
 class JournalEntry:
     '''
     Each individual journal entry in the journal will be its own instance.
@@ -198,6 +273,9 @@ class JournalEntry:
     Following the layout in a T account, debits are on the left, and credits
     are on the right
     '''
+    # Journals hold a lot of these, skip the per-entry __dict__
+    __slots__ = ('date', 'acc_debit', 'acc_credit', 'amount', 'memo')
+
     def __init__(self, date, acc_debit, acc_credit, amount, memo=''):
         if None in (acc_debit, acc_credit):
             raise ValueError('Cannot create JournalEntry with a Null account!')
@@ -219,6 +297,248 @@ class JournalEntry:
         return f'Journal Entry: {self.acc_debit} <- {self.acc_credit} for {self.amount}'
 
 
+# Keys of a single rule that split_wages() actually reads
+_RULE_KEYS = ('amount', 'memo', 'round', 'round_method')
+_RULE_SECTIONS = ('ADDITIONAL_WAGES', 'PRE_TAX_DEDUCTIONS', 'TAXES',
+                  'POST_TAX_DEDUCTIONS')
+
+def _clone_rules(rules):
+    '''
+    Copy a wage ruleset so that sections can be added to or replaced without
+    touching the original.
+
+    Only the section lists are copied, the rule dicts and accounts inside are
+    shared, so edit a rule by replacing it rather than mutating it in place.
+    Much cheaper than a deepcopy(), which would also copy every Account and
+    its template.
+    '''
+    return {k: list(v) if isinstance(v, list) else v for k, v in rules.items()}
+
+def _parse_split_str(split_str):
+    '''
+    Parse numbers or percentages and return a decimal variable.
+
+    Returns a 2-tuple (is_percentage, value)
+        where is_percentage is a boolean
+        and value is the float value of the input
+    '''
+    try:
+        return (False, float(split_str))
+    except ValueError as e:
+        if split_str.strip()[-1] == '%':
+            return (True, float(split_str.strip()[:-1]) / 100)
+        else:
+            raise ValueError(f'Unparseable split_str "{split_str}"')
+
+def _to_decimal(value):
+    '''
+    Decimal of a number as it was written rather than its binary float value,
+    eg 0.1 -> Decimal('0.1')
+    '''
+    return Decimal(str(value))
+
+def _compile_amount(rule):
+    '''
+    _parse_split_str() a rule's amount, caching the result on the rule itself
+    under '_compiled_amount' since rulesets are reused for every paycheck.
+
+    The cache remembers the amount it was parsed from, so reassigning
+    rule['amount'] is always picked up.
+
+    Returns (is_percentage, value, exact_value) where exact_value is value as
+    a Decimal, for rounded splits.
+    '''
+    spec = rule['amount']
+    cached = rule.get('_compiled_amount')
+    if cached is not None and cached[0] == spec \
+            and type(cached[0]) is type(spec):
+        return cached[1]
+
+    is_percentage, value = _parse_split_str(spec)
+    if is_percentage:
+        exact_value = _to_decimal(float(spec.strip()[:-1])).scaleb(-2)
+    else:
+        exact_value = _to_decimal(value)
+    compiled = (is_percentage, value, exact_value)
+    rule['_compiled_amount'] = (spec, compiled)
+    return compiled
+
+_CENT = Decimal('0.01')
+# round_method -> decimal rounding mode used to round a split to the cent
+_ROUND_METHODS = {
+    'Normal': ROUND_HALF_UP,
+    'Truncate': ROUND_DOWN,
+    # Python's own round() is a banker's round
+    'Banker': ROUND_HALF_EVEN,
+}
+
+def _compile_rules(rules):
+    '''
+    Do all of the per-ruleset work of split_wages() once: parse every amount
+    string and resolve every step's rounding against the global settings.
+
+    Returns ((acc_debit, acc_credit, memo), steps) where steps is every rule
+    of every section, in order, as
+        (phase, acc_debit, acc_credit, is_percentage, value, exact_value,
+         rounding, memo)
+    with phase being the index of the rule's section in _RULE_SECTIONS and
+    rounding the decimal rounding mode to use, or None to leave it unrounded.
+    '''
+    # Set up global rounding constants and behavior
+    global_round = rules.get('round', False)
+    global_round_method = rules.get('round_method', "Banker")
+
+    top = (rules['acc_debit'], rules['acc_credit'], rules['memo'])
+
+    steps = []
+    for phase, section in enumerate(_RULE_SECTIONS):
+        for rule in rules[section]:
+            # Check any rounding overrides for this step
+            if rule.get('round', global_round):
+                round_method = rule.get('round_method', global_round_method)
+                if round_method not in _ROUND_METHODS:
+                    raise ValueError('Invalid round_method specified')
+                rounding = _ROUND_METHODS[round_method]
+            else:
+                rounding = None
+
+            is_percentage, value, exact_value = _compile_amount(rule)
+            # Only the additional wages have ever carried their memo through
+            memo = rule['memo'] if section == 'ADDITIONAL_WAGES' else ''
+            steps.append((phase, rule['acc_debit'], rule['acc_credit'],
+                          is_percentage, value, exact_value, rounding, memo))
+
+    return top, tuple(steps)
+
+def _split_amounts(wages, steps):
+    '''
+    The numeric core of wage splitting, run a step at a time across a whole
+    batch of paychecks so that the per-step work (unpacking it, picking the
+    rounding path) is paid once per batch instead of once per paycheck.
+
+    Returns (amounts, totals): amounts holds one list of per-paycheck split
+    amounts for each step, and totals one list of per-paycheck totals for
+    each section.
+    '''
+    count = len(wages)
+
+    # Running total of each section: additional wages, pre tax deductions,
+    # taxes and post tax deductions
+    totals = [[0] * count for _ in _RULE_SECTIONS]
+    amounts = []
+    phase = 0
+    starting_wages = wages
+    for step_phase, _, _, is_percentage, value, exact_value, rounding, _ \
+            in steps:
+        if step_phase != phase:
+            # Each section splits what is left after the sections before it,
+            # with additional wages (bonuses, vacation) added on top
+            phase = step_phase
+            starting_wages = [
+                wage + additional for wage, additional in zip(wages, totals[0])
+            ]
+            for section_totals in totals[1:phase]:
+                starting_wages = [
+                    wage - total
+                    for wage, total in zip(starting_wages, section_totals)
+                ]
+
+        if rounding is None:
+            if is_percentage:
+                step_wages = [wage * value for wage in starting_wages]
+            else:
+                step_wages = [value] * count
+        elif is_percentage:
+            # Work rounded splits out in exact decimal cents so float error
+            # can't push them over a rounding boundary, 138.8 * 5% is 6.94
+            # not 6.940000000000001
+            step_wages = [
+                float((exact_value * _to_decimal(wage))
+                      .quantize(_CENT, rounding=rounding))
+                for wage in starting_wages
+            ]
+        else:
+            step_wages = \
+                [float(exact_value.quantize(_CENT, rounding=rounding))] * count
+
+        totals[phase] = [
+            total + step_wage
+            for total, step_wage in zip(totals[phase], step_wages)
+        ]
+        amounts.append(step_wages)
+
+    return amounts, totals
+
+def _apply_rules(wages, compiled):
+    '''
+    Run a batch of paychecks through a ruleset from _compile_rules() without
+    creating any JournalEntry's (which would post to the accounts).
+
+    Returns one list of (acc_debit, acc_credit, amount, memo) tuples per
+    paycheck, in the order the entries should be made.
+    '''
+    (acc_debit, acc_credit, memo), steps = compiled
+    amounts, totals = _split_amounts(wages, steps)
+
+    to_return = []
+    for i, gross_wages in enumerate(wages):
+        splits = [(acc_debit, acc_credit, gross_wages, memo)]
+        splits.extend(
+            (step_debit, step_credit, step_amounts[i], step_memo)
+            for (_, step_debit, step_credit, *_, step_memo), step_amounts
+            in zip(steps, amounts)
+        )
+
+        gross_wages += totals[0][i]
+        pre_tax_ded_total = totals[1][i]
+        tax_total = totals[2][i]
+        post_tax_ded_total = totals[3][i]
+
+        if pre_tax_ded_total > gross_wages:
+            raise ValueError('Pre Tax Deductions are larger than gross wages')
+        if tax_total > gross_wages \
+                or tax_total + pre_tax_ded_total > gross_wages:
+            raise ValueError('Taxes have pushed gross wages negative')
+        if post_tax_ded_total > gross_wages \
+                or post_tax_ded_total + tax_total + pre_tax_ded_total \
+                > gross_wages:
+            raise ValueError(
+                'Post Tax deductions have pushed gross wages negative')
+
+        to_return.append(splits)
+    return to_return
+
+def _hash_rules(rules):
+    '''
+    Build a hashable snapshot of a wage ruleset for the split_wages() cache.
+
+    Accounts are keyed by id() since it is the account objects themselves the
+    entries get posted to, not their value.  Section order is kept since it
+    decides the order (and running balance) of the splits.
+
+    Returns None if the ruleset is incomplete or some rule value is
+    unhashable, meaning "don't cache" (and let the real split report it).
+    '''
+    def rule_key(rule):
+        return (id(rule['acc_credit']), id(rule['acc_debit'])) \
+            + tuple(rule.get(key) for key in _RULE_KEYS)
+
+    try:
+        key = (rule_key(rules),) + tuple(
+            tuple(rule_key(rule) for rule in rules[section])
+            for section in _RULE_SECTIONS
+        )
+        hash(key)
+    except (KeyError, TypeError):
+        return None
+    return key
+
+_WAGE_SPLIT_CACHE_SIZE = 256
+# (type(gross_wages), gross_wages, _hash_rules(rules)) -> list of
+# (acc_debit, acc_credit, amount, memo).  The cached tuples hold references to
+# the accounts, so an id() in a live key can never be reused by another object
+_wage_split_cache = {}
+
 def split_wages(gross_wages, rules, date=datetime.now()):
     '''
     Given a gross wage amount and a set of rules with which to split them,
@@ -241,160 +561,59 @@ def split_wages(gross_wages, rules, date=datetime.now()):
 
     This function will do the operations in order and return a list of
     JournalEntry's that represent the splitting of your paycheck.
-    '''
-    def parse_split_str(split_str):
-        '''
-        Parse numbers or percentages and return a decimal variable.
-
-        Returns a 2-tuple (is_percentage, value)
-            where is_percentage is a boolean
-            and value is the float value of the input
-        '''
-        try:
-            return (False, float(split_str))
-        except ValueError as e:
-            if split_str.strip()[-1] == '%':
-                return (True, float(split_str.strip()[:-1]) / 100)
-            else:
-                raise ValueError(f'Unparseable split_str "{split_str}"')
-
-    def split_wage(starting_wage, split_str, round_method):
-        '''
-        Do logic to determine the split of the starting wage with either
-        flat amounts or percentages.
-
-        pass round_method = None to skip rounding
-
-        Returns either split_str as a float or if split_str ends with a
-        '%', returns that percentage of the starting_wage
-        '''
-        is_percentage, split_str = parse_split_str(split_str)
-        if is_percentage:
-            split_str = starting_wage * split_str
-        
-        if round_method == 'Normal':
-            split_str = normal_round(split_str, 2)
-        elif round_method == 'Truncate':
-            split_str = truncate(split_str, 2)
-        elif round_method == 'Banker':
-            # The default Python round() function is a banker's round
-            # implementation
-            split_str = round(split_str, 2)
-        elif round_method is None:
-            pass
-        else:
-            raise ValueError('Invalid round_method specified')
-        
-        return split_str
-
-    to_return = []
 
-    # Set up global rounding constants and behavior
-    global_round = rules.get('round', False)
-    global_round_method = rules.get('round_method', "Banker")
+    The splits themselves are cached per (gross_wages, ruleset), so running
+    the same rules for a whole payroll only does the math once.  Each call
+    still makes fresh JournalEntry's since those post to the accounts.
 
-    to_return.append(JournalEntry(date=date, acc_credit=rules['acc_credit'],
-                                  acc_debit=rules['acc_debit'],
-                                  amount=gross_wages, memo=rules['memo']))
-    
-    # These could be flat amounts or percentages in the case of bonuses
-    additional_wage_total = 0
-    for additional_wage in rules['ADDITIONAL_WAGES']:
-        # Check any rounding overrides for this step
-        step_round = additional_wage.get('round', global_round)
-
-        if step_round:
-            step_round_method = additional_wage.get('round_method',
-                                                    global_round_method)
-        else:
-            step_round_method = None
-        step_wage = split_wage(starting_wage=gross_wages,
-                               split_str=additional_wage['amount'],
-                               round_method=step_round_method)
-        additional_wage_total += step_wage
-        to_return.append(
-            JournalEntry(date=date, acc_credit=additional_wage['acc_credit'],
-                         acc_debit=additional_wage['acc_debit'],
-                         amount=step_wage, memo=additional_wage['memo']))
-        
-    # Add vacation and bonus credit to the total wages being calculated
-    gross_wages += additional_wage_total
-
-    pre_tax_ded_total = 0
-    for deduction in rules['PRE_TAX_DEDUCTIONS']:
-        step_round = deduction.get('round', global_round)
-        if step_round:
-            step_round_method = deduction.get('round_method',
-                                              global_round_method)
-        else:
-            step_round_method = None
-        step_wage = split_wage(starting_wage=gross_wages,
-                               split_str=deduction['amount'],
-                               round_method=step_round_method)
-
-        pre_tax_ded_total += step_wage
-        to_return.append(
-            JournalEntry(date=date, acc_credit=deduction['acc_credit'],
-                         acc_debit=deduction['acc_debit'], amount=step_wage))
-        
-
-    if pre_tax_ded_total > gross_wages:
-        raise ValueError('Pre Tax Deductions are larger than gross wages')
-
-
-    tax_total = 0
-    for tax in rules['TAXES']:
-        step_round = tax.get('round', global_round)
-        if step_round:
-            step_round_method = tax.get('round_method', global_round_method)
-        else:
-            step_round_method = None
-        
-        step_wage = split_wage(starting_wage=gross_wages - pre_tax_ded_total,
-                               split_str=tax['amount'],
-                               round_method=step_round_method)
-
-        tax_total += step_wage
-        to_return.append(
-            JournalEntry(date=date, acc_credit=tax['acc_credit'],
-                         acc_debit=tax['acc_debit'], amount=step_wage)
-        )
-
-    if tax_total > gross_wages or tax_total + pre_tax_ded_total > gross_wages:
-        raise ValueError('Taxes have pushed gross wages negative')
-
-    post_tax_ded_total = 0
-    for deduction in rules['POST_TAX_DEDUCTIONS']:
-        step_round = deduction.get('round', global_round)
-        if step_round:
-            step_round_method = deduction.get('round_method',
-                                              global_round_method)
-        else:
-            step_round_method = None
-        step_wage = \
-            split_wage(starting_wage=gross_wages-pre_tax_ded_total-tax_total,
-                       split_str=deduction['amount'],
-                       round_method=step_round_method)
-        post_tax_ded_total += step_wage
-
-        to_return.append(
-            JournalEntry(date=date, acc_credit=deduction['acc_credit'],
-                         acc_debit=deduction['acc_debit'], amount=step_wage)
-        )
-    
-    
-    if post_tax_ded_total > gross_wages \
-            or post_tax_ded_total + tax_total + pre_tax_ded_total > gross_wages:
-        raise ValueError('Post Tax deductions have pushed gross wages negative')
-    
-    """
-    print('=====================')
-    print(gross_wages)
-    print(pre_tax_ded_total)
-    print(tax_total)
-    print(post_tax_ded_total)
-    print('=====================')
-    """
+    Note that each rule dict gets a '_compiled_amount' key added to it,
+    holding its parsed amount.
+    '''
+    rules_key = _hash_rules(rules)
+    if rules_key is None:
+        splits = _apply_rules([gross_wages], _compile_rules(rules))[0]
+    else:
+        cache_key = (type(gross_wages), gross_wages, rules_key)
+        splits = _wage_split_cache.get(cache_key)
+        if splits is None:
+            splits = _apply_rules([gross_wages], _compile_rules(rules))[0]
+            if len(_wage_split_cache) >= _WAGE_SPLIT_CACHE_SIZE:
+                _wage_split_cache.clear()
+            _wage_split_cache[cache_key] = splits
+
+    return [
+        JournalEntry(date=date, acc_debit=acc_debit, acc_credit=acc_credit,
+                     amount=amount, memo=memo)
+        for acc_debit, acc_credit, amount, memo in splits
+    ]
+
+def split_wages_batch(wages, rules, date=datetime.now()):
+    '''
+    split_wages() for a whole payroll: split every paycheck in wages by the
+    same ruleset.
 
-    return to_return
+    The ruleset is only parsed once for the batch and each distinct wage
+    amount is only worked out once, which is most of the cost when a single
+    ruleset covers many employees.
 
+    Returns a list with one list of JournalEntry's per paycheck, in order.
+    '''
+    # Only work out each distinct wage once
+    wages = list(wages)
+    distinct_wages = list({
+        (type(gross_wages), gross_wages): gross_wages for gross_wages in wages
+    }.values())
+    splits_by_wage = dict(zip(
+        ((type(gross_wages), gross_wages) for gross_wages in distinct_wages),
+        _apply_rules(distinct_wages, _compile_rules(rules))
+    ))
+
+    return [
+        [
+            JournalEntry(date=date, acc_debit=acc_debit, acc_credit=acc_credit,
+                         amount=amount, memo=memo)
+            for acc_debit, acc_credit, amount, memo
+            in splits_by_wage[(type(gross_wages), gross_wages)]
+        ]
+        for gross_wages in wages
+    ]
@@ -7,7 +7,8 @@ Also contains helper methods to print and export the ledger as well.
 from __future__ import annotations # list type annotations
 
 import re
-from typing import Union  # Multiple type annotation
+from functools import lru_cache
+from typing import Iterable, Union  # Multiple type annotation
 
 from pybooks.util import DuplicateException
 from pybooks.enums import AccountingMethods, AccountType
@@ -21,6 +22,9 @@ DEFINED_FILTERS = (
     'lt', 'lte',
     'gt', 'gte',
 )
+# Fuzzy filter values made only of these are plain strings, not regexes, so
+# they can be looked up in an index rather than re.match()ed
+_PLAIN_VALUE_RE = re.compile(r'[\w ,/-]*', re.ASCII)
 
 
 class _Ledger:
@@ -73,6 +77,18 @@ class _Ledger:
             raise DuplicateException('Account already exists in this ledger.')
         self.accounts[account.number] = account
 
+    def add_accounts(self, accounts:Iterable[Account]):
+        '''
+        Add many pre-existing Account instances to this ledger at once.
+
+        Nothing is added if any of the accounts would be rejected by
+        add_account().
+        '''
+        # Everything in self.accounts went through the chart of accounts, so
+        # its duplicate checks cover this ledger's accounts too
+        accounts = self.chart_of_accounts.add_accounts(accounts)
+        self.accounts.update((account.number, account) for account in accounts)
+
     def get_new_account(self, name:str, account_type:AccountType,
                         initial_balance:float=0, **kwargs) -> Account:
         '''
@@ -129,7 +145,8 @@ class _Ledger:
         return new_acc
 
 
-    def _keys_match(self, acc_key, user_key):
+    @staticmethod
+    def _keys_match(acc_key, user_key):
         '''
         Need to separate the comparing of keys (eg, "name") from their values
         for the filter function.
@@ -155,11 +172,29 @@ class _Ledger:
         # print(f'Comparing acc_key {acc_key} and user_key {user_key}...{keys_match}')
         return keys_match or keys_match_exact
 
-    def _term_matches_filter(self, account_val, user_key, user_val,
-                             fuzzy_match=True):
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _resolve_key(acc_keys:tuple[str], user_key:str) -> str|None:
+        '''
+        The first of acc_keys that user_key filters on, or None.
+
+        Queries keep using the same handful of keywords against the same
+        template, so each keyword is only run through _keys_match() once.
+        '''
+        for acc_key in acc_keys:
+            if _Ledger._keys_match(acc_key, user_key):
+                return acc_key
+        return None
+
+    @staticmethod
+    def _compile_filter(user_key, user_val, fuzzy_match=True):
         '''
         Implement the logic of the kw__contains filters for the filter_accounts
         method for the various filters I choose to implement.
+
+        Returns a function of an account value that says whether it matches,
+        so the filter is only parsed (and its regexes compiled) once per
+        query rather than once per account.
         '''
 
         # Default to equality if none specified
@@ -172,37 +207,32 @@ class _Ledger:
             raise ValueError('User specified a nonexistant filter '
                                 f'operation: {user_filter}')
         
-        # print(type(user_key), user_val)
-        # print(type(account_val), account_val)
-        # print(user_val == account_val)
-        
         # Begin specifying any of the __dunder filters I will handle
         re_flag = re.IGNORECASE
         if user_filter == 'eq':
             # fuzzy_match means ignore case and type differences
             if fuzzy_match:
-                if re.match(f'^{user_val}$', str(account_val), re_flag):
-                    return True
-            elif account_val == user_val:
-                return True
+                pattern = re.compile(f'^{user_val}$', re_flag)
+                return lambda account_val: \
+                    pattern.match(str(account_val)) is not None
+            return lambda account_val: account_val == user_val
         # The value must be an iterable
         elif user_filter == 'in':
-            for val in user_val:
-                if fuzzy_match and re.match(f'^{val}$', str(account_val), re_flag):
-                    return True
-                elif val == account_val:
-                    return True
-        elif user_filter == 'lt':
-            return int(account_val) < int(user_val)
+            user_vals = list(user_val)
+            patterns = []
+            if fuzzy_match:
+                patterns = [re.compile(f'^{val}$', re_flag) for val in user_vals]
+            return lambda account_val: account_val in user_vals or any(
+                pattern.match(str(account_val)) for pattern in patterns)
+        
+        bound = int(user_val)
+        if user_filter == 'lt':
+            return lambda account_val: int(account_val) < bound
         elif user_filter == 'lte':
-            return int(account_val) <= int(user_val)
+            return lambda account_val: int(account_val) <= bound
         elif user_filter == 'gt':
-            return int(account_val) > int(user_val)
-        elif user_filter == 'gte':
-            return int(account_val) >= int(user_val)
-        
-        # Default return False
-        return False
+            return lambda account_val: int(account_val) > bound
+        return lambda account_val: int(account_val) >= bound
 
     def filter_accounts(self, match_all=True, fuzzy_match=True, **kwargs) \
             -> list[Account]:
@@ -226,61 +256,107 @@ class _Ledger:
         ledger.filter_accounts(account_code='121')
         '''
 
-        DEBUG = False
-
-        to_return = []
         if not kwargs:
             return []
 
-        for account in self.chart_of_accounts.values():
-            # All possible values we want to allow the user to filter on
-            search_dict = {
-                # All the named sections from this account's number
-                **account._account_number._dict,
-                'name': account.name
-            }
-
-            DEBUG and print('search_dict: ', search_dict)
-
-            # Keep track of AND or OR behavior
-            num_user_keys_matched = 0
-
-            DEBUG and print('\nsearching new account...')
-            for user_key, user_value in kwargs.items():
-                DEBUG and print(f'\tcomparing user key: {user_key} ({user_value})')
-                for acc_key, acc_value in search_dict.items():
-                    DEBUG and print('acc_key, acc_value: ', acc_key, acc_value)
-                    # Go ahead to compare key values
-                    if self._keys_match(acc_key, user_key):
-                        # Not just a simple equality check, also does filters
-                        term_matches_filter = self._term_matches_filter(
-                            acc_value, user_key, user_value, fuzzy_match
-                        )
-                        DEBUG and print(f'\t\t...to acc key {acc_key} ({acc_value})...', end='')
-                        DEBUG and print(term_matches_filter)
-                        if term_matches_filter:
-                            num_user_keys_matched += 1
-                            # OR short-circuit
-                            if not match_all:
-                                to_return.append(account)
-
-                        # No point in hitting the other keys, we found the
-                        # match for this user input
-                        break
-
-            # Only add the AND if OR behavior not specified - will already be
-            # added
-            if match_all and num_user_keys_matched == len(kwargs.items()):
-                to_return.append(account)
-
-        DEBUG and print('filter_accounts return...', to_return)
-        return to_return
+        accounts, columns = self.chart_of_accounts._columns()
+        acc_keys = tuple(columns)
+
+        # Work out which column each filter searches once, then either look
+        # the answer up in that column's index or scan only that column.
+        # One set of matching account positions for each filter
+        matched = []
+        for user_key, user_value in kwargs.items():
+            acc_key = self._resolve_key(acc_keys, user_key)
+            if acc_key is None:
+                # Nothing can match every filter if one matches no key
+                if match_all:
+                    return []
+                continue
+
+            positions = self._index_matches(acc_key, user_key, user_value,
+                                            fuzzy_match)
+            if positions is None:
+                matches = self._compile_filter(user_key, user_value,
+                                               fuzzy_match)
+                positions = {
+                    i for i, value in enumerate(columns[acc_key])
+                    if value is not None and matches(value)
+                }
+            matched.append(positions)
+
+        if not matched:
+            return []
+
+        # AND or OR behavior.  Each account is only returned once, even if it
+        # matches several filters
+        if match_all:
+            positions = set.intersection(*matched)
+        else:
+            positions = set.union(*matched)
+        return [accounts[i] for i in sorted(positions)]
+
+    def _index_matches(self, acc_key, user_key, user_val, fuzzy_match=True):
+        '''
+        Answer an eq or in filter from the chart of accounts' inverted index
+        for acc_key instead of scanning every account.
+
+        Returns the set of matching account positions, or None if the filter
+        can't be answered this way: any other filter operation, or fuzzy
+        values that could be regexes.
+        '''
+        user_filter = 'eq'
+        if FILTER_TOKEN in user_key:
+            user_key, _, user_filter = user_key.partition(FILTER_TOKEN)
+
+        if user_filter == 'eq':
+            user_vals = (user_val,)
+        # Only collections that can be safely iterated over twice
+        elif user_filter == 'in' \
+                and isinstance(user_val, (list, tuple, set, frozenset)):
+            user_vals = user_val
+        else:
+            return None
+
+        if fuzzy_match:
+            user_vals = [str(val) for val in user_vals]
+            if not all(_PLAIN_VALUE_RE.fullmatch(val) for val in user_vals):
+                return None
+            user_vals = [val.lower() for val in user_vals]
+
+        index = self.chart_of_accounts._column_index(acc_key, fuzzy_match)
+        if index is None:
+            return None
+
+        positions = set()
+        for val in user_vals:
+            try:
+                positions.update(index.get(val, ()))
+            except TypeError:
+                # Unhashable, leave it to the scan
+                return None
+        return positions
 
     def get_account(self, **kwargs) -> Account|None:
         '''
         Single result extension of filter_accounts() that will throw an error
         if more than one item matches
         '''
+        # A single eq filter, like account_code='500', is just an index lookup
+        if len(kwargs) == 1:
+            (user_key, user_value), = kwargs.items()
+            accounts, columns = self.chart_of_accounts._columns()
+            acc_key = self._resolve_key(tuple(columns), user_key)
+            if acc_key is None:
+                return None
+
+            positions = self._index_matches(acc_key, user_key, user_value)
+            if positions is not None:
+                if len(positions) > 1:
+                    raise ValueError(
+                        'More than 1 Account returned for get_account()')
+                return accounts[positions.pop()] if positions else None
+
         result = self.filter_accounts(**kwargs)
         if len(result) > 1:
             raise ValueError('More than 1 Account returned for get_account()')
@@ -317,17 +393,27 @@ class _Ledger:
         if not accounts:
             return 0
 
-        net_balance = 0
+        if reporting_format != AccountType.DEBIT \
+                and reporting_format != AccountType.CREDIT:
+            # Every account counts against an unknown format
+            return -sum(account.net_balance for account in accounts)
 
-
-        # The net_balance property does the logic of parsing whether
+        # Net the accounts as debits in one pass, only the initial balances
+        # depend on each account's side of the books.  Reporting as a credit
+        # just flips the sign
+        initial = debits = credits = 0
         for account in accounts:
-            if account.account_type == reporting_format:
-                net_balance += account.net_balance
+            if account._is_debit:
+                initial += account.initial_balance
             else:
-                net_balance -= account.net_balance
-
-        return net_balance
+                initial -= account.initial_balance
+            debits += account.gross_debit
+            credits += account.gross_credit
+
+        net_debit = initial + debits - credits
+        if reporting_format == AccountType.DEBIT:
+            return net_debit
+        return -net_debit
             
 
 class GeneralLedger(_Ledger):
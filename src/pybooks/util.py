@@ -1,6 +1,15 @@
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+from decimal import Context, Decimal, MAX_PREC, ROUND_DOWN, ROUND_HALF_UP
+from functools import lru_cache
+from itertools import chain, product
 import math
-from typing import Union
+import re
+from threading import Lock
+from typing import Callable, Union
+
+_DIGITS_RE = re.compile(r'\d')
 
 class DuplicateException(Exception):
     pass
@@ -22,64 +31,58 @@ class NullAccountTemplateError(Exception):
     '''
     pass
 
+# Enough precision that quantize() never runs out of digits, even for huge
+# floats like 1e300
+_EXACT = Context(prec=MAX_PREC)
+
+@lru_cache(maxsize=None)
+def _decimal_places(decimals:int) -> Decimal:
+    '''
+    The Decimal exponent to quantize() to, eg 2 -> Decimal('0.01')
+    '''
+    return Decimal(1).scaleb(-decimals)
+
 def truncate(num:Union[int, float], decimals:int):
     '''
     Truncates a decimal number to a certain length of decimal places
     '''
+    # inf and nan have no decimal places to cut off
+    if not math.isfinite(num):
+        return num
+
     # Short-circuit check
     if decimals == 0:
         return int(num)
-    
-    dec_place = str(num).find('.')
 
-    # No decimals, nothing to round
-    if dec_place == -1:
+    # Nothing to cut off
+    if isinstance(num, int):
         return num
-    
-    # Python lets you over-extend slicing ranges on strings
-    # Need to add the extra 1 since the end index is non-inclusive
-    return float(str(num)[0:dec_place+decimals+1])    
+
+    # Work on the number as it is written (str(23.564) == '23.564') so no
+    # binary float error creeps in
+    return float(Decimal(str(num)).quantize(_decimal_places(decimals),
+                                            rounding=ROUND_DOWN,
+                                            context=_EXACT))
 
 def normal_round(num:Union[int,float], decimals:int):
     '''
     Perform a normal schoolyard rounding operation, rounding up to the next
-    place on 5's
+    place on 5's (away from zero for negative numbers)
     '''
-    whole_num = ''
-    dec = ''
-
-    seen_dec = False
-    dec_place = 0
-
-    for char in str(num):
-        if char == '.':
-            seen_dec = True
-            continue
-        if not seen_dec:
-            whole_num += char
-            continue
-        dec += char
-        dec_place += 1
-
-        if dec_place == decimals + 1:
-            break
-    
-    # Round up
-    if int(dec[-1]) >= 5:
-        # Need special logic here in case of whole number rounding
-        if decimals == 0:
-            return math.ceil(num)
-        dec = f'{dec[0:-2]}{int(dec[-2]) + 1}0'
-    # Round down
-    else:
-        if decimals == 0:
-            return math.floor(num)
-        dec = dec[:-1]
-
+    if not math.isfinite(num):
+        return num
 
-    return float(f'{whole_num}.{dec}')
+    # Like truncate(), round the written number so 23.455 -> 23.46 even
+    # though the float is really 23.45499...
+    rounded = Decimal(str(num)).quantize(_decimal_places(decimals),
+                                         rounding=ROUND_HALF_UP,
+                                         context=_EXACT)
+    if decimals == 0:
+        return int(rounded)
+    return float(rounded)
 
-def calculate_progressive_tax(taxable_income:Union[int, float], tax_brackets:list):
+def calculate_progressive_tax(taxable_income:Union[int, float], tax_brackets:list,
+                              strict=True):
     '''
     Method to dynamically calculate the amount of money that a certain income
     would owe in taxes using the given (progressive) tax brackets.
@@ -97,6 +100,124 @@ def calculate_progressive_tax(taxable_income:Union[int, float], tax_brackets:lis
         (0.30, 'inf')
     ]
     ```
+
+    The tax owed up to each bracket is worked out once per set of brackets,
+    so an income only has to find its bracket.
+
+    An income beyond the last bracket raises a ValueError, or with
+    strict=False gives None.
+    '''
+    brackets = _normalize_brackets(tax_brackets)
+    return _lookup_tax(taxable_income, brackets, _get_tax_table(brackets),
+                       strict)
+
+def calculate_progressive_tax_batch(taxable_incomes:list, tax_brackets:list,
+                                    strict=True) -> list:
+    '''
+    calculate_progressive_tax() for many incomes against the same brackets,
+    in order.
+
+    With strict=False incomes beyond the last bracket give None rather than
+    stopping the whole batch with a ValueError.
+    '''
+    brackets = _normalize_brackets(tax_brackets)
+    table = _get_tax_table(brackets)
+    return [_lookup_tax(income, brackets, table, strict)
+            for income in taxable_incomes]
+
+def compile_progressive_tax(tax_brackets:list, strict=True) \
+        -> Callable[[Union[int, float]], float]:
+    '''
+    calculate_progressive_tax() with the brackets fixed, for callers that
+    keep taxing incomes against the same brackets (eg a tax year's).
+
+    The brackets are read once here, so the returned function goes
+    straight to finding each income's bracket.  Changing tax_brackets
+    afterwards doesn't affect it.
+    '''
+    brackets = _normalize_brackets(tax_brackets)
+    table = _get_tax_table(brackets)
+
+    def progressive_tax(taxable_income):
+        return _lookup_tax(taxable_income, brackets, table, strict)
+    return progressive_tax
+
+def _normalize_brackets(tax_brackets) -> tuple:
+    '''
+    The brackets as a tuple of (rate, max income as a float) tuples, eg
+    'inf' -> math.inf.  Equivalent brackets then share a cached table, and
+    brackets given as lists (eg from JSON) can be cached at all.
+
+    Stops converting at the first malformed bracket, the rest are left as
+    they are for the tax calculation to raise on if it gets that far.
+    '''
+    brackets = tuple(tax_brackets)
+    normalized = []
+    for bracket in brackets:
+        try:
+            rate, max_income = bracket
+            normalized.append((rate, float(max_income)))
+        except (TypeError, ValueError):
+            break
+    return tuple(normalized) + brackets[len(normalized):]
+
+def _get_tax_table(brackets:tuple):
+    try:
+        return _tax_table(brackets)
+    except TypeError:
+        # Unhashable brackets, eg lists, just don't get cached
+        return _tax_table.__wrapped__(brackets)
+
+def _lookup_tax(taxable_income, brackets:tuple, table:tuple, strict=True):
+    maxes, rates, prev_maxes, owed = table
+    i = bisect_left(maxes, taxable_income)
+    if i < len(maxes) and taxable_income <= maxes[i]:
+        return owed[i] + rates[i] * (taxable_income - prev_maxes[i])
+
+    # Past the brackets the table covers.  If the table stopped short, the
+    # next bracket is malformed and the full walk raises the right error
+    if len(maxes) < len(brackets):
+        return _progressive_tax_walk(taxable_income, brackets)
+    if not strict:
+        return None
+    raise ValueError('Income beyond last defined tax bracket detected')
+
+@lru_cache(maxsize=128)
+def _tax_table(tax_brackets:tuple):
+    '''
+    (maxes, rates, prev_maxes, owed) lined up by bracket, where owed is the
+    tax on an income that fills every bracket before it.  The sums are built
+    in the same order _progressive_tax_walk() adds them, so both give the
+    same floats.
+
+    Stops at the first malformed bracket.
+    '''
+    maxes, rates, prev_maxes, owed = [], [], [], []
+    to_return = 0
+    prev_max = 0
+    for bracket in tax_brackets:
+        try:
+            rate, max_income = bracket
+            max_income = float(max_income)
+            if max_income <= prev_max:
+                break
+            filled = to_return + rate * (max_income - prev_max)
+        except (TypeError, ValueError):
+            break
+
+        maxes.append(max_income)
+        rates.append(rate)
+        prev_maxes.append(prev_max)
+        owed.append(to_return)
+
+        to_return = filled
+        prev_max = max_income
+
+    return tuple(maxes), tuple(rates), tuple(prev_maxes), tuple(owed)
+
+def _progressive_tax_walk(taxable_income, tax_brackets):
+    '''
+    calculate_progressive_tax() one bracket at a time
     '''
     to_return = 0
     prev_max = 0
@@ -123,89 +244,216 @@ def calculate_progressive_tax(taxable_income:Union[int, float], tax_brackets:lis
     
 
 
+_DATE_SEPARATORS = ('/', '-', ',', ', ', ' ')
+_DATE_FORMATS = [
+    ('%Y', '%m', '%d'),         # 2001/05/25, with any variation of separator
+    ('%a', '%b', '%d', '%Y'),   # Sun Jan 22, 2023
+    ('%A', '%b', '%d', '%Y'),   # Sunday Jan 22, 2023
+    ('%a', '%B', '%d', '%Y'),   # Sun January 22, 2023
+    ('%A', '%B', '%d', '%Y'),   # Sunday January 22, 2023
+]
+_TIME_FORMATS = [
+    '%H',           # 13
+    '%I %p',        # 1 PM
+    '%H:%M',        # 13:25
+    '%I:%M %p',     # 1:25 PM
+    '%H:%M:%S',     # 13:25:01
+    '%I:%M:%S %p',  # 1:25:01 PM
+]
+_TIME_SUFFIXES = (
+    '%Z',       # Timezones like GMT, PST 
+)
+
+@lru_cache(maxsize=None)
+def _date_format_candidates(has_time, time_first_half):
+    '''
+    Date format, eg '%Y/%m/%d' -> every format parse_date() will try for a
+    date written that way, in the order it tries them, for dates with or
+    without a time (and with the time in the first or second half).
+
+    These never change so they are only ever built once.
+    '''
+    candidates = {}
+    for form in _DATE_FORMATS:
+        for seps in product(_DATE_SEPARATORS, repeat=len(form) - 1):
+            built_form = _date_format(form, seps)
+            if not has_time:
+                candidates[built_form] = (built_form,)
+                continue
+
+            formats = []
+            for time in _TIME_FORMATS:
+                if time_first_half:
+                    formats.append(f'{time} {built_form}')
+                    formats.extend(f'{time} {suffix} {built_form}'
+                                   for suffix in _TIME_SUFFIXES)
+                else:
+                    formats.append(f'{built_form} {time}')
+                    formats.extend(f'{built_form} {time} {suffix}'
+                                   for suffix in _TIME_SUFFIXES)
+            candidates[built_form] = tuple(formats)
+    return candidates
+
+def _date_format(form, seps):
+    '''
+    Interleave a date form's directives with separators, eg
+    ('%Y', '%m', '%d') and ('/', '-') -> '%Y/%m-%d'
+    '''
+    return ''.join(chain.from_iterable(zip(form, seps + ('',))))
+
+# Loose patterns for the pieces of a date, just enough to tell which form and
+# separators it is written with.  They match at least whatever strptime()
+# would, which still has the final say
+_NAME_PATTERN = r'[^\W\d_][^\s\d/,-]*'
+_DATE_FIELD_PATTERNS = {
+    '%Y': r'\d{4}',
+    '%m': r'\d{1,2}',
+    '%d': r'(?:\d{1,2}| \d)',
+    '%a': _NAME_PATTERN,
+    '%A': _NAME_PATTERN,
+    '%b': _NAME_PATTERN,
+    '%B': _NAME_PATTERN,
+}
+# strptime() reads a ' ' in a format as any run of spaces
+_DATE_SEPARATOR_PATTERN = r'(/|-|,|,\s+|\s+)'
+_TIME_PATTERN = rf'\d{{1,2}}(?::\d{{1,2}}){{0,2}}(?:\s+{_NAME_PATTERN}){{0,2}}'
+
+@lru_cache(maxsize=None)
+def _date_form_matchers(has_time, time_first_half):
+    '''
+    A regex for each of _DATE_FORMATS, capturing the separators between its
+    fields
+    '''
+    matchers = []
+    for form in _DATE_FORMATS:
+        regex = _DATE_SEPARATOR_PATTERN.join(_DATE_FIELD_PATTERNS[directive]
+                                             for directive in form)
+        if has_time and time_first_half:
+            regex = rf'{_TIME_PATTERN}\s+{regex}'
+        elif has_time:
+            regex = rf'{regex}\s+{_TIME_PATTERN}'
+        matchers.append(re.compile(regex, re.IGNORECASE))
+    return matchers
+
+def _date_separator(sep):
+    '''
+    The _DATE_SEPARATORS entry a separator matched by _DATE_SEPARATOR_PATTERN
+    was written with
+    '''
+    if sep[0] == ',':
+        return ',' if sep == ',' else ', '
+    return ' ' if sep.isspace() else sep
+
+_DATE_FORMAT_CACHE_SIZE = 512
+# Date "shape" (see parse_date) -> the format that last parsed that shape,
+# least recently used first so the shapes still in use survive eviction
+_date_format_cache = OrderedDict()
+# Lookups and evictions take several steps on the cache, another thread
+# evicting in between would leave them looking for a shape that's gone
+_date_format_lock = Lock()
+# Hits and misses of _date_format_cache, see parse_date.shape_cache_info()
+_date_format_stats = [0, 0]
+
+_ShapeCacheInfo = namedtuple('ShapeCacheInfo',
+                             ['hits', 'misses', 'maxsize', 'currsize'])
+
+def _cached_date_format(shape):
+    '''
+    The format that last parsed a shape, or None
+    '''
+    with _date_format_lock:
+        date_format = _date_format_cache.get(shape)
+        if date_format is None:
+            _date_format_stats[1] += 1
+        else:
+            _date_format_cache.move_to_end(shape)
+            _date_format_stats[0] += 1
+        return date_format
+
+def _cache_date_format(shape, date_format):
+    with _date_format_lock:
+        if shape in _date_format_cache:
+            _date_format_cache.move_to_end(shape)
+        elif len(_date_format_cache) >= _DATE_FORMAT_CACHE_SIZE:
+            _date_format_cache.popitem(last=False)
+        _date_format_cache[shape] = date_format
+
 def parse_date(date, user_format=None):
     '''
     Parse a date according to some predefined rules.
 
     If it is already a datetime just return it.
+
+    The format found for a date is remembered for every date of the same
+    shape, ie the same string with its digits blanked out, so parsing a run
+    of similar dates only searches the format list once.  Recently parsed
+    strings are remembered outright.  parse_date.cache_clear() forgets both,
+    parse_date.shape_cache_info() reports on the shapes.
     '''
     if isinstance(date, datetime):
         return date
+    return _parse_date(date, user_format)
 
+# datetimes are immutable, so the same one can be handed out every time
+@lru_cache(maxsize=8192)
+def _parse_date(date, user_format):
     if user_format is not None:
         return datetime.strptime(date, user_format)
 
-    DATE_SEPARATORS = ('/', '-', ',', ', ', ' ')
-    DATE_FORMATS = [
-        ('%Y', '%m', '%d'),         # 2001/05/25, with any variation of separator
-        ('%a', '%b', '%d', '%Y'),   # Sun Jan 22, 2023
-        ('%A', '%b', '%d', '%Y'),   # Sunday Jan 22, 2023
-        ('%a', '%B', '%d', '%Y'),   # Sun January 22, 2023
-        ('%A', '%B', '%d', '%Y'),   # Sunday January 22, 2023
-    ]
-    TIME_FORMATS = [
-        '%H',           # 13
-        '%I %p',        # 1 PM
-        '%H:%M',        # 13:25
-        '%I:%M %p',     # 1:25 PM
-        '%H:%M:%S',     # 13:25:01
-        '%I:%M:%S %p',  # 1:25:01 PM
-    ]
-    TIME_SUFFIXES = (
-        '%Z',       # Timezones like GMT, PST 
-    )
+    has_time = ':' in date
+    # 'Sun July 23, 2023' and 'Sun July 24, 2023' share a shape
+    shape = _DIGITS_RE.sub('9', date.lower())
 
-    def date_builder(queue, result='', total=[]):
-        if not queue:
-            return result
+    cached_format = _cached_date_format(shape)
+    if cached_format is not None:
+        try:
+            return datetime.strptime(date, cached_format)
+        except ValueError:
+            # Same shape but out of range values, eg a 13th month
+            pass
 
-        result += queue[0]
-        if len(queue) == 1:
-            return result
+    # Times are tried before or after the date depending on where they sit
+    time_first_half = has_time and date.find(':') / len(date) < 0.5
 
-        for sep in DATE_SEPARATORS:
-            total.append(date_builder(queue[1:], result+sep, total))
-        
-        return total
+    # Only the separators a date is written with are worth trying, the rest
+    # would all fail
+    candidates = _date_format_candidates(has_time, time_first_half)
+    for form, regex in zip(_DATE_FORMATS,
+                           _date_form_matchers(has_time, time_first_half)):
+        match = regex.fullmatch(date)
+        if match is None:
+            continue
 
+        seps = tuple(_date_separator(sep) for sep in match.groups())
+        for date_format in candidates[_date_format(form, seps)]:
+            try:
+                result = datetime.strptime(date, date_format)
+            except ValueError:
+                continue
+
+            _cache_date_format(shape, date_format)
+            return result
 
-    has_time = ':' in date
-    # print(date)
-    for form in DATE_FORMATS:
-        if not has_time:
-            for built_form in date_builder(form):
-                try:
-                    return datetime.strptime(date, built_form)
-                except:
-                    continue
-        else:
-            # All dates at this point will have a time component
-            time_first_half = date.find(':') / len(date) < 0.5
-
-            for bf in date_builder(form):
-                for time in TIME_FORMATS:
-                    if time_first_half:
-                        try:
-                            return datetime.strptime(date, f'{time} {bf}')
-                        except:
-                            pass
-                    else:
-                        try:
-                            return datetime.strptime(date, f'{bf} {time}')
-                        except:
-                            pass
-                    for suffix in TIME_SUFFIXES:
-                        if time_first_half:
-                            try:
-                                return datetime.strptime(f'{time} {suffix} {bf}')
-                            except:
-                                pass
-                        else:
-                            try:
-                                return datetime.strptime(f'{bf} {time} {suffix}')
-                            except:
-                                pass
-    
     return None
-            
 
+def _shape_cache_info():
+    '''
+    parse_date.shape_cache_info(): hits, misses, maxsize and currsize of the
+    date shape cache only.  Repeated strings never reach it, see
+    _parse_date.cache_info() for those
+    '''
+    with _date_format_lock:
+        return _ShapeCacheInfo(*_date_format_stats, _DATE_FORMAT_CACHE_SIZE,
+                               len(_date_format_cache))
+
+def _date_cache_clear():
+    '''
+    parse_date.cache_clear(), forgets every parsed string and date shape
+    '''
+    _parse_date.cache_clear()
+    with _date_format_lock:
+        _date_format_cache.clear()
+        _date_format_stats[:] = [0, 0]
+
+parse_date.shape_cache_info = _shape_cache_info
+parse_date.cache_clear = _date_cache_clear
@@ -0,0 +1,76 @@
+'''
+Shared pytest fixtures
+'''
+import re
+
+import pytest
+
+from pybooks.account import Account, AccountNumberSegment, \
+    AccountNumberTemplate
+from pybooks.enums import AccountType
+
+from util import init_template
+
+
+@pytest.fixture(scope='session')
+def template():
+    '''
+    The standard XX-XX-XXX template used throughout the tests.
+
+    Nothing mutates a template once it is built, so one is shared by the
+    whole session
+    '''
+    return init_template()
+
+
+@pytest.fixture(scope='session')
+def single_digit_template():
+    '''
+    A one segment template whose account numbers are any single digit
+    '''
+    seg = AccountNumberSegment('test', {re.compile(r'\d'): 'test'},
+                               is_regex=True)
+    return AccountNumberTemplate(seg)
+
+
+@pytest.fixture
+def cd_accounts(template):
+    '''
+    A fresh (credit, debit) pair of accounts for posting journal entries
+    '''
+    return (
+        Account('Creditor', '01-01-100', AccountType.CREDIT, template=template),
+        Account('Debtor', '01-01-101', AccountType.DEBIT, template=template)
+    )
+
+
+@pytest.fixture
+def wage_rules(template):
+    '''
+    split_wages() rules for a Company Pay paycheck with a single 10% federal
+    income tax, on fresh accounts.  Tests change the rules as they need
+    '''
+    job_acc = Account('Company Pay', number='01-00-100',
+                      account_type=AccountType.CREDIT, template=template)
+    gross_wages = Account('Gross Wages', number='10-00-100',
+                          account_type=AccountType.DEBIT, template=template)
+    fed_acc = Account('FICA', number='02-00-100',
+                      account_type=AccountType.DEBIT, template=template)
+
+    return {
+        'acc_credit': job_acc,
+        'acc_debit': gross_wages,
+        'memo': 'Gross Wages from Company',
+
+        'ADDITIONAL_WAGES': [],
+        'PRE_TAX_DEDUCTIONS': [],
+        'TAXES': [
+            {
+                'acc_credit': gross_wages,
+                'acc_debit': fed_acc,
+                'amount': '10%',
+                'memo': 'Federal Income Tax'
+            }
+        ],
+        'POST_TAX_DEDUCTIONS': []
+    }
@@ -1,4 +1,7 @@
+import copy
 from datetime import datetime
+from itertools import chain, cycle
+import pickle
 import re
 
 import pytest
@@ -10,7 +13,34 @@ from pybooks.ledger import GeneralLedger, SubLedger
 from pybooks.enums import AccountType
 from pybooks.util import InvalidAccountNumberException, DuplicateException
 
-from util import init_template
+from util import make_account_number
+
+# Patterns shared across tests, compiled once at import
+_RE_ASSETS = re.compile(r'1\d\d')
+_RE_LIABILITIES = re.compile(r'2\d\d')
+_RE_EQUITY = re.compile(r'3\d\d')
+_RE_REVENUE = re.compile(r'4\d\d')
+_RE_EXPENSES = re.compile(r'5\d\d')
+_RE_TENS = re.compile(r'1\d')
+_RE_TWENTIES = re.compile(r'2\d')
+_RE_DIGIT = re.compile(r'\d')
+_RE_TWO_DIGITS = re.compile(r'\d\d')
+_RE_THREE_DIGITS = re.compile(r'\d\d\d')
+_RE_LITERAL_01 = re.compile('01')
+_RE_EMPTY = re.compile('')
+_RE_INTEREST = re.compile('Interest')
+
+# Variable length regex's are not allowed in an AccountNumberSegment
+_VAR_LEN_REGEXES = (
+    re.compile(r'\d{1}'),
+    re.compile(r'\d{1,2}'),
+    re.compile(r'\d+')
+)
+
+# Account numbers on the standard init_template() layout
+_DEBIT_NUMS = tuple(f'{x:02}-01-100' for x in range(1, 4))
+_CREDIT_NUMS = tuple(f'{x:02}-01-100' for x in range(10, 15))
+_AGG_NUMS = tuple(f'01-{x:02}-100' for x in range(3))
 
 
 def test_init():
@@ -20,8 +50,10 @@ def test_init():
     Account('Cash - BMO', '1', AccountType.DEBIT, template=template)
 
     ChartOfAccounts(template)
+
+def test_init_full(template):
     # Test that the template I use for all my other tests inits
-    template = init_template()
+    assert template
 
 def test_account_number_segments():
     '''
@@ -29,12 +61,8 @@ def test_account_number_segments():
     '''
     seg1_vals = {
         f'{num:02}': f'cmpny{num}'
-        for num in range(1, 4)
+        for num in chain(range(1, 4), range(10, 15))
     }
-    seg1_vals.update({
-        f'{num:02}': f'cmpny{num}'
-        for num in range(10, 15)
-    })
 
     seg1 = AccountNumberSegment('Company Name', seg1_vals)
     seg2 = AccountNumberSegment('Department Name', {
@@ -47,11 +75,11 @@ def test_account_number_segments():
     assert seg2['02'] == 'dpt2'
 
     seg3 = AccountNumberSegment('Account Type', {
-        re.compile(r'1\d\d'): 'Assets',
-        re.compile(r'2\d\d'): 'Liabilities',
-        re.compile(r'3\d\d'): 'Equity',
-        re.compile(r'4\d\d'): 'Revenue',
-        re.compile(r'5\d\d'): 'Expenses',
+        _RE_ASSETS: 'Assets',
+        _RE_LIABILITIES: 'Liabilities',
+        _RE_EQUITY: 'Equity',
+        _RE_REVENUE: 'Revenue',
+        _RE_EXPENSES: 'Expenses',
     }, is_regex=True)
 
     # Test regex __getitem__ behavior
@@ -65,29 +93,106 @@ def test_account_number_segments():
     with pytest.raises(KeyError):
         seg3['0300']
 
-    # Variable length regex's are not allowed
-    var_len_regex = (
-        re.compile(r'\d{1}'),
-        re.compile(r'\d{1,2}'),
-        re.compile(r'\d+')
-    )
-
-    for reg in var_len_regex:
-        with pytest.raises(InvalidAccountNumberException):
-            AccountNumberSegment('test', {reg: 'value'}, is_regex=True)
-
     # Forgetting to designate a regex segment as a regex raises an error
     with pytest.raises(TypeError):
-        AccountNumberSegment('test', {re.compile(r'\d'): 'a'})
+        AccountNumberSegment('test', {_RE_DIGIT: 'a'})
 
     # Creating a regex segment with different length regexs raises an error
     regex = {
-        re.compile(r'\d'): '1',
-        re.compile(r'\d\d'): '2',
+        _RE_DIGIT: '1',
+        _RE_TWO_DIGITS: '2',
     }
     with pytest.raises(InvalidAccountNumberException):
         AccountNumberSegment('test', regex, is_regex=True)
 
+@pytest.mark.parametrize('regex', _VAR_LEN_REGEXES,
+                         ids=lambda regex: regex.pattern)
+def test_var_len_regex_rejected(regex):
+    with pytest.raises(InvalidAccountNumberException):
+        AccountNumberSegment('test', {regex: 'value'}, is_regex=True)
+
+@pytest.mark.parametrize('regex', [
+    _RE_ASSETS, _RE_THREE_DIGITS, re.compile('123'), re.compile(r'\d1\d'),
+    re.compile('1.3'),
+], ids=lambda regex: regex.pattern)
+@pytest.mark.parametrize('value', ['100', '199', '123', '213', '1a0',
+                                   '\u0661\u0662\u0663'])
+def test_segment_digit_fast_path(regex, value):
+    '''
+    Digit-only regexes skip the regex engine, make sure they still agree
+    with it
+    '''
+    segment = AccountNumberSegment('test', {regex: 'value'}, is_regex=True)
+    try:
+        found = segment[value] == 'value'
+    except KeyError:
+        found = False
+    assert found == bool(regex.fullmatch(value))
+    assert (value in segment) == found
+
+@pytest.mark.parametrize('regexes', [
+    (_RE_ASSETS, _RE_THREE_DIGITS, _RE_EXPENSES),
+    (_RE_THREE_DIGITS, _RE_ASSETS),
+    # Mixed flags aren't combined into one regex
+    (re.compile(r'1\d\d', re.ASCII), _RE_THREE_DIGITS),
+], ids=lambda regexes: ','.join(regex.pattern for regex in regexes))
+def test_segment_first_regex_wins(regexes):
+    '''
+    Segments with several regexes give the meaning of the first that matches
+    '''
+    segment = AccountNumberSegment(
+        'test', {regex: i for i, regex in enumerate(regexes)}, is_regex=True)
+    for value in ('100', '150', '500', '999', '1a0'):
+        expected = next((i for i, regex in enumerate(regexes)
+                         if regex.fullmatch(value)), None)
+        assert segment.get(value) == expected
+        if expected is None:
+            assert value not in segment
+        else:
+            assert segment[value] == expected
+
+def test_segment_meanings_read_only():
+    meanings = {'01': 'Company 1'}
+    segment = AccountNumberSegment('Company Code', meanings)
+    assert '01' in segment
+    assert '02' not in segment
+    assert segment.get('01') == 'Company 1'
+    assert segment.get('02', 'missing') == 'missing'
+
+    with pytest.raises(TypeError):
+        segment.meanings['02'] = 'Company 2'
+
+    # Changing the dict it was built from doesn't change the segment either
+    meanings['02'] = 'Company 2'
+    assert '02' not in segment
+
+@pytest.mark.parametrize('copier', [
+    copy.deepcopy,
+    lambda obj: pickle.loads(pickle.dumps(obj)),
+])
+def test_account_copy_round_trip(template, copier):
+    account = Account('Cash', '01-01-100', AccountType.DEBIT,
+                      template=template)
+    copied = copier(account)
+    assert copied.name == 'Cash'
+    assert copied.number == '01-01-100'
+
+    # The segments still look values up the same way
+    account_code = copied._account_number.template.segments['Account Code']
+    assert account_code['123'] == 'Assets'
+    assert '623' not in account_code
+    assert dict(account_code.meanings) == \
+        dict(template.segments['Account Code'].meanings)
+
+def test_account_str_subclass_name(template):
+    class Name(str):
+        pass
+
+    account = Account(Name('Cash'), '01-01-100', AccountType.DEBIT,
+                      template=template)
+    assert account.name == 'Cash'
+    assert isinstance(account.name, Name)
+
 def test_account_number_auto_segments():
     '''
     1/13/2026 In order to support dynamic account creation (ie, creating a
@@ -104,7 +209,7 @@ def test_account_number_auto_segments():
     seg1 = AccountNumberSegment('Company Code',
                                 {'01': 'Company 1', '02': 'Company 2'})
     seg2 = AccountNumberSegment('Index', meanings={
-        re.compile(r'\d\d\d'): 'misc' 
+        _RE_THREE_DIGITS: 'misc' 
     }, is_regex=True, incrementable=True)
 
     normal_template = AccountNumberTemplate(seg1)
@@ -135,12 +240,12 @@ def test_account_number_auto_segments():
                                       **{'Company Code': '01'})
     assert acc3._account_number.index == '001'
 
-    with pytest.raises(ValueError):
-        error_seg = AccountNumberSegment(name='error',
-                                         meanings={re.compile('01'): 'A'},
-                                         is_regex=True, incrementable=True)
-        # Creating a template with 2 incrementable segments raises an error
-        _error_template = AccountNumberTemplate(seg1, seg2, error_seg)
+    error_seg = AccountNumberSegment(name='error',
+                                     meanings={_RE_LITERAL_01: 'A'},
+                                     is_regex=True, incrementable=True)
+    # Creating a template with 2 incrementable segments raises an error
+    with pytest.raises(ValueError, match='more than one incrementing segment'):
+        AccountNumberTemplate(seg1, seg2, error_seg)
 
     # Test that removed accounts are re-filled
     # The best way I have to delete an account
@@ -148,7 +253,7 @@ def test_account_number_auto_segments():
 
     # Test Account Number Increment Overflow Detection
     seg_overflow = AccountNumberSegment(name='overflow',
-                                        meanings={re.compile(r'\d'): 'Index'},
+                                        meanings={_RE_DIGIT: 'Index'},
                                         is_regex=True, incrementable=True)
     overflow_template = AccountNumberTemplate(seg1, seg_overflow)
     overflow_ledger = GeneralLedger('overflow ledger',
@@ -167,10 +272,10 @@ def test_account_number_auto_segments():
     # Creating an AccountNumberSegment with an incrementable field can
     # only have its meanings be a dict with a single regex line
     with pytest.raises(AssertionError):
-        multiple_regex_segment = AccountNumberSegment(
+        AccountNumberSegment(
             name='a', meanings={
-                re.compile(r'1\d'): 'test',
-                re.compile(r'2\d'): 'test2'
+                _RE_TENS: 'test',
+                _RE_TWENTIES: 'test2'
             },
             is_regex=True, incrementable=True
         )
@@ -183,7 +288,7 @@ def test_auto_segments_with_subledgers():
     seg1 = seg1 = AccountNumberSegment('Company Code',
                                 {'01': 'Company 1', '02': 'Company 2'})
     auto_seg = AccountNumberSegment(name='overflow',
-                                    meanings={re.compile(r'\d'): 'Index'},
+                                    meanings={_RE_DIGIT: 'Index'},
                                     is_regex=True, incrementable=True)
     template = AccountNumberTemplate(seg1, auto_seg)
     gen_l = GeneralLedger(name='gen_ledg', account_number_template=template)
@@ -209,7 +314,7 @@ def test_creating_accounts_with_int_segment_values():
     those be automatically assumed and applied
     '''
 
-    seg = AccountNumberSegment('test_seg', {re.compile(r'\d\d\d'): 'whatever'},
+    seg = AccountNumberSegment('test_seg', {_RE_THREE_DIGITS: 'whatever'},
                                is_regex=True)
     template = AccountNumberTemplate(seg)
     acc1 = template.make_account(name='acc1', account_type=AccountType.CREDIT,
@@ -231,45 +336,39 @@ def test_creating_accounts_with_int_segment_values():
     res = gen.filter_accounts(test_seg__lte=1)
     assert len(res) == 2
 
-def test_account_number_template():
-    template = init_template()
-
+def test_account_number_template(template):
     assert template._show_form() == 'XX-XX-XXX'
-
-    valid_numbers = (
-        '01-02-100',
-        '01-02-350',
-        '10-00-450',
-        '10-00-599',
-    )
-
-    for number in valid_numbers:
-        assert template.validate_account_number(number)
-
-    invalid_numbers = (
-        '00-02-100',
-        '10--02-100',
-        ' 10-02-100',
-        '10-99-100',
-        '10-02-001',
-        '10-02-99',
-        '10_00_599',
-        '10-00-700'
-    )
-
-    for number in invalid_numbers:
-        assert template.validate_account_number(number) is False
-    
     assert template.validate_account_number('10_00_450', separator='_')
 
-def test_show_account_template():
+@pytest.mark.parametrize('number', (
+    '01-02-100',
+    '01-02-350',
+    '10-00-450',
+    '10-00-599',
+))
+def test_valid_number(template, number):
+    assert template.validate_account_number(number)
+
+@pytest.mark.parametrize('number', (
+    '00-02-100',
+    '10--02-100',
+    ' 10-02-100',
+    '10-99-100',
+    '10-02-001',
+    '10-02-99',
+    '10_00_599',
+    '10-00-700'
+))
+def test_invalid_number(template, number):
+    assert template.validate_account_number(number) is False
+
+def test_show_account_template(template):
     # TODO write a test to verify the show_template() function shows the
     # possible values for each segment.
-    template = init_template()
 
     assert template._show_form() == 'XX-XX-XXX'
 
-def test_account_from_template():
+def test_account_from_template(template):
     '''
     8/20/23 I am shelving the idea of default segments
     In order to facilitate creating larger account numbers with default
@@ -290,31 +389,29 @@ def test_account_from_template():
         'Account Code': '100'
     })
     '''
-    template = init_template()
-
-
-    with pytest.raises(ValueError):
-        error_rules = {
-            'Non-Existant-Segment': '01'
-        }
-        acc_num = template._make_account_number(**error_rules)
+    error_rules = {
+        'Non-Existant-Segment': '01'
+    }
+    with pytest.raises(ValueError, match='DNE in template'):
+        template._make_account_number(**error_rules)
 
     # Does not contain details for the other mandatory segments
-    with pytest.raises(ValueError):
-        error_rules = {
-            'Company Code': '01'
-        }
-        acc_num = template._make_account_number(**error_rules)
+    error_rules = {
+        'Company Code': '01'
+    }
+    with pytest.raises(ValueError, match='mandatory segment'):
+        template._make_account_number(**error_rules)
 
 
     # Contains an invalid value for one of the segments
-    with pytest.raises(InvalidAccountNumberException):
-        error_rules = {
-            'Company Code': '100',
-            'Department Code': '01',
-            'Account Code': '100'
-        }
-        acc_num = template._make_account_number(**error_rules)
+    error_rules = {
+        'Company Code': '100',
+        'Department Code': '01',
+        'Account Code': '100'
+    }
+    with pytest.raises(InvalidAccountNumberException,
+                       match='does not match the given template'):
+        template._make_account_number(**error_rules)
 
     # Now test good rules
     rules = {
@@ -337,16 +434,15 @@ def test_account_from_template():
     assert acc.net_balance == 500
     
 
-def test_account_number():
+def test_account_number(template):
     '''
     Test various functionality of the _AccountNumber class
     '''
-    template = init_template()
 
-    number1 = _AccountNumber('10-02-200', template)
-    number2 = _AccountNumber('10-00-300', template)
-    number3 = _AccountNumber('01-00-300', template)
-    number4 = _AccountNumber('11-01-500', template)
+    number1 = make_account_number('10-02-200', template)
+    number2 = make_account_number('10-00-300', template)
+    number3 = make_account_number('01-00-300', template)
+    number4 = make_account_number('11-01-500', template)
 
     with pytest.raises(InvalidAccountNumberException):
         _AccountNumber('99-00-200', template)
@@ -358,8 +454,8 @@ def test_account_number():
 
     assert number2 < number1
     assert number1 > number2
-    assert all([number3 < num for num in [number1, number2, number4]])
-    assert all([number4 > num for num in [number1, number2, number3]])
+    assert all(number3 < num for num in (number1, number2, number4))
+    assert all(number4 > num for num in (number1, number2, number3))
 
     assert number1['Company Code'] == '10'
     assert number1['Department Code'] == '02'
@@ -368,15 +464,9 @@ def test_account_number():
 
     assert number1.number == '10-02-200'
 
-def test_add_journal():
-    template = init_template()
-
+def test_add_journal(cd_accounts):
     j = Journal()
-
-    acc_credit = Account('Creditor', '01-01-100', AccountType.CREDIT,
-                         template=template)
-    acc_debit = Account('Debtor', '01-01-101', AccountType.DEBIT,
-                        template=template)
+    acc_credit, acc_debit = cd_accounts
 
     now = datetime(2023, 7, 23)
     for _ in range(3):
@@ -386,14 +476,9 @@ def test_add_journal():
     assert len(acc_credit.journal_entries) == 3
     assert len(acc_debit.journal_entries) == 3
 
-def test_gross_balance():
-    template = init_template()
+def test_gross_balance(cd_accounts):
     j = Journal()
-
-    acc_credit = Account('Creditor', '01-01-100', AccountType.CREDIT,
-                         template=template)
-    acc_debit = Account('Debtor', '01-01-101', AccountType.DEBIT,
-                        template=template)
+    acc_credit, acc_debit = cd_accounts
 
     now = datetime(2023, 7, 23)
     for _ in range(3):
@@ -420,13 +505,12 @@ def test_chart_of_accounts_add_account():
     # Adding an account with a different template raises an error
     seg2 = AccountNumberSegment('seg', {'100': 'test'})
     template2 = AccountNumberTemplate(seg2)
-    with pytest.raises(ValueError):
-        chart.add_account(Account('test', '100', AccountType.CREDIT,
-                                template=template2))
+    account2 = Account('test', '100', AccountType.CREDIT, template=template2)
+    with pytest.raises(ValueError, match='different AccountNumberTemplate'):
+        chart.add_account(account2)
 
-def test_account():
-    template = init_template()
-    acc_num = _AccountNumber('01-01-100', template)
+def test_account(template):
+    acc_num = make_account_number('01-01-100', template)
 
     # Test equality
     acc1 = Account('Cash - JPM', acc_num, AccountType.CREDIT)
@@ -442,7 +526,7 @@ def test_account():
     assert acc1 != Account('Cash - JPM', acc_num, AccountType.DEBIT)
 
     # Accounts must have a name
-    with pytest.raises(ValueError):
+    with pytest.raises(ValueError, match='empty name'):
         Account('', '01-01-100', AccountType.CREDIT, template=template)
 
     # String account numbers must be initialized with a template
@@ -450,23 +534,22 @@ def test_account():
         Account('test', '123', AccountType.CREDIT)
 
     # Create an account with an invalid accountType
-    with pytest.raises(ValueError):
+    with pytest.raises(ValueError, match='invalid Account type'):
         Account('test', '01-01-100', 'invalid', template=template)
 
     # Getitem should automatically return the account number's value
     assert acc1['Company Code'] == '01' 
 
     
-def test_account_aggregation():
+def test_account_aggregation(template):
     '''
     I am going to need a way to roll up multiple accounts and just get the
     end net debit or credit balance
     '''
-    template = init_template()
     accounts = []
 
-    for x in range(3):
-        accounts.append(Account('acc', f'01-{x:02}-100', AccountType.CREDIT,
+    for number in _AGG_NUMS:
+        accounts.append(Account('acc', number, AccountType.CREDIT,
                                 template=template))
     
     # No transactions have been posted
@@ -488,19 +571,18 @@ def test_account_aggregation():
     assert Account.net_balance_agg(accounts[1:], AccountType.CREDIT) == 600
     assert Account.net_balance_agg([accounts[0]], AccountType.DEBIT) == 600
 
-def test_get_net_transfer():
+def test_get_net_transfer(template):
     '''
     Check the transfers from one group of accounts to another
     '''
     debit_accounts = []
     credit_accounts = []
 
-    template = init_template()
-    for x in range(1, 4):
-        debit_accounts.append(Account(f'acc{x}', f'{x:02}-01-100',
+    for x, number in enumerate(_DEBIT_NUMS, start=1):
+        debit_accounts.append(Account(f'acc{x}', number,
                                       AccountType.CREDIT, template=template))
-    for x in range(10, 15):
-        credit_accounts.append(Account(f'acc{x}', f'{x:02}-01-100',
+    for x, number in enumerate(_CREDIT_NUMS, start=10):
+        credit_accounts.append(Account(f'acc{x}', number,
                                        AccountType.DEBIT, template=template))
     
     for _ in range(3):
@@ -517,15 +599,18 @@ def test_get_net_transfer():
     # Transactions made to outside accounts should have no effect
     new_acc = Account('t', '01-02-100', AccountType.CREDIT, template=template)
 
-    for x in range(100):  
-        JournalEntry(datetime.now(), debit_accounts[x%len(debit_accounts)],
-                     new_acc, 100)
-        JournalEntry(datetime.now(), credit_accounts[x%len(credit_accounts)],
-                     new_acc, 100)
-        JournalEntry(datetime.now(), new_acc,
-                     debit_accounts[x%len(debit_accounts)], 100)
-        JournalEntry(datetime.now(), new_acc,
-                     credit_accounts[x%len(credit_accounts)], 100)
+    # None of these entries are checked by date, so they can share one
+    entries = []
+    _now = datetime.now()
+    for debit_acc, credit_acc, _ in zip(cycle(debit_accounts),
+                                        cycle(credit_accounts), range(100)):
+        entries.append(JournalEntry(_now, debit_acc, new_acc, 100))
+        entries.append(JournalEntry(_now, credit_acc, new_acc, 100))
+        entries.append(JournalEntry(_now, new_acc, debit_acc, 100))
+        entries.append(JournalEntry(_now, new_acc, credit_acc, 100))
+    j = Journal()
+    j.add_entries(entries)
+    assert j.num_entries == 400
     assert Account.get_net_transfer(debit_accounts, credit_accounts) == 200
 
 
@@ -572,9 +657,9 @@ def test_get_net_transfer():
 
     assert Account.get_net_transfer(debit_accounts=[acc1],
                                     credit_accounts=[acc2],
-                                    memo=re.compile('')) == -2900
+                                    memo=_RE_EMPTY) == -2900
     
     assert Account.get_net_transfer(debit_accounts=[acc1],
                                     credit_accounts=[acc2],
-                                    memo=re.compile('Interest')) == 100
+                                    memo=_RE_INTEREST) == 100
 
@@ -1,25 +1,98 @@
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 from textwrap import dedent
 import re
-from copy import deepcopy
 
 import pytest
 
-from pybooks.journal import Journal, JournalEntry, split_wages
+from pybooks.journal import Journal, JournalEntry, split_wages, \
+    split_wages_batch, _clone_rules
 from pybooks.account import Account
 from pybooks.enums import AccountType
 from pybooks.util import normal_round, truncate
 
-from util import init_template
 
+# Expected print_journal() output, see test_print_journal
+_EXPECTED_SHORT = dedent('''\
+    Date             Account         Debit     Credit
+    =================================================
+    July 23, 2023    Debtor          $5,000
+                         Creditor              $5,000
+    -------------------------------------------------
+    July 23, 2023    Debtor          $5,000
+                         Creditor              $5,000
+    -------------------------------------------------
+    July 23, 2023    Debtor          $5,000
+                         Creditor              $5,000
+    -------------------------------------------------
+    ''')
+
+_EXPECTED_LONG = dedent('''\
+    Date                 Account         Debit     Credit
+    =====================================================
+    January 23, 2023     Debtor          $10
+                             Creditor              $10
+    -----------------------------------------------------
+    July 23, 2023        Debtor          $5,000
+                             Creditor              $5,000
+    -----------------------------------------------------
+    July 23, 2023        Debtor          $5,000
+                             Creditor              $5,000
+    -----------------------------------------------------
+    July 23, 2023        Debtor          $5,000
+                             Creditor              $5,000
+    -----------------------------------------------------
+    December 23, 2023    Debtor          $1
+                             Creditor              $1
+    -----------------------------------------------------
+    ''')
+
+_EXPECTED_NUMBERS = dedent('''\
+    Date                 Account          Debit     Credit
+    ======================================================
+    January 23, 2023     01-00-200        $10
+                             01-00-100              $10
+    ------------------------------------------------------
+    July 23, 2023        01-00-200        $5,000
+                             01-00-100              $5,000
+    ------------------------------------------------------
+    July 23, 2023        01-00-200        $5,000
+                             01-00-100              $5,000
+    ------------------------------------------------------
+    July 23, 2023        01-00-200        $5,000
+                             01-00-100              $5,000
+    ------------------------------------------------------
+    December 23, 2023    01-00-200        $1
+                             01-00-100              $1
+    ------------------------------------------------------
+    ''')
 
-def test_init():
+_EXPECTED_NUMBERS_NAMES = dedent('''\
+    Date                 Account                   Debit     Credit
+    ===============================================================
+    January 23, 2023     01-00-200 Debtor          $10
+                             01-00-100 Creditor              $10
+    ---------------------------------------------------------------
+    July 23, 2023        01-00-200 Debtor          $5,000
+                             01-00-100 Creditor              $5,000
+    ---------------------------------------------------------------
+    July 23, 2023        01-00-200 Debtor          $5,000
+                             01-00-100 Creditor              $5,000
+    ---------------------------------------------------------------
+    July 23, 2023        01-00-200 Debtor          $5,000
+                             01-00-100 Creditor              $5,000
+    ---------------------------------------------------------------
+    December 23, 2023    01-00-200 Debtor          $1
+                             01-00-100 Creditor              $1
+    ---------------------------------------------------------------
+    ''')
+
+
+def test_init(template):
     j = Journal()
-    init_template()
 
-def test_add_entries():
+def test_add_entries(template):
     j = Journal()
-    template = init_template()
 
     acc_credit = Account('Creditor', '01-00-100', AccountType.CREDIT,
                          template=template)
@@ -27,9 +100,8 @@ def test_add_entries():
                         template=template)
 
     now = datetime(2023, 7, 23)
-    for _ in range(3):
-        je = JournalEntry(now, acc_debit, acc_credit, 500)
-        j.add_entry(je)
+    j.add_entries(JournalEntry(now, acc_debit, acc_credit, 500)
+                  for _ in range(3))
     
     assert j._entries[now][0].amount == 500
     assert j._entries[now][2].date == now
@@ -40,9 +112,8 @@ def test_add_entries():
     assert j.num_entries == 3
 
     next_day = datetime(2023, 7, 24)
-    for _ in range(3):
-        je = JournalEntry(next_day, acc_debit, acc_credit, 200)
-        j.add_entry(je)
+    j.add_entries(JournalEntry(next_day, acc_debit, acc_credit, 200)
+                  for _ in range(3))
     
     assert len(j._entries) == 2
     assert j.num_entries == 6
@@ -55,9 +126,56 @@ def test_add_entries():
     assert acc_credit.gross_credit == 2300
     assert acc_debit.gross_debit == 2300
 
-def test_print_journal(capsys):
+def test_add_entries_bulk(template):
+    j = Journal()
+
+    acc_credit = Account('Creditor', '01-00-100', AccountType.CREDIT,
+                         template=template)
+    acc_debit = Account('Debtor', '01-00-300', AccountType.DEBIT,
+                        template=template)
+
+    now = datetime(2023, 7, 23)
+    next_day = datetime(2023, 7, 24)
+    j.add_entries([
+        JournalEntry(now, acc_debit, acc_credit, 500),
+        JournalEntry(next_day, acc_debit, acc_credit, 200),
+        JournalEntry(now, acc_debit, acc_credit, 100),
+    ])
+
+    assert j.num_entries == 3
+    assert len(j._entries) == 2
+    # Entries on the same date keep the order they were given in
+    assert [je.amount for je in j._entries[now]] == [500, 100]
+    assert j.accounts == {acc_credit, acc_debit}
+
+    # A bad entry anywhere in the batch means nothing gets added
+    with pytest.raises(TypeError):
+        j.add_entries([JournalEntry(now, acc_debit, acc_credit, 1), 'entry'])
+    assert j.num_entries == 3
+
+def test_add_entry_failure(cd_accounts):
+    '''
+    An entry that can't be added leaves the journal as it was
+    '''
+    acc_credit, acc_debit = cd_accounts
+    j = Journal()
+    j.add_entry(JournalEntry(datetime(2023, 7, 23), acc_debit, acc_credit, 1))
+
+    # Naive and aware dates can't be sorted together
+    aware = datetime(2023, 7, 24, tzinfo=timezone.utc)
+    with pytest.raises(TypeError):
+        j.add_entry(JournalEntry(aware, acc_debit, acc_credit, 1))
+    assert j.num_entries == 1
+    assert aware not in j._entries
+
+    with pytest.raises(TypeError):
+        j.add_entries([JournalEntry(aware, acc_debit, acc_credit, 1)])
+    assert j.num_entries == 1
+    assert aware not in j._entries
+    assert len(j._entries_flat) == 1
+
+def test_print_journal(capsys, template):
     j = Journal()
-    template = init_template()
 
     acc_credit = Account('Creditor', '01-00-100', AccountType.CREDIT,
                          template=template)
@@ -72,19 +190,7 @@ def test_print_journal(capsys):
     j.print_journal()
     out, err = capsys.readouterr()
 
-    assert out == dedent('''\
-        Date             Account         Debit     Credit
-        =================================================
-        July 23, 2023    Debtor          $5,000
-                             Creditor              $5,000
-        -------------------------------------------------
-        July 23, 2023    Debtor          $5,000
-                             Creditor              $5,000
-        -------------------------------------------------
-        July 23, 2023    Debtor          $5,000
-                             Creditor              $5,000
-        -------------------------------------------------
-        ''')
+    assert out == _EXPECTED_SHORT
     
     # Out of order journal entries will show chronologically
     j.add_entry(JournalEntry(datetime(2023, 1, 23), acc_debit, acc_credit, 10))
@@ -93,83 +199,56 @@ def test_print_journal(capsys):
     
     out, err = capsys.readouterr()
 
-    assert out == dedent('''\
-        Date                 Account         Debit     Credit
-        =====================================================
-        January 23, 2023     Debtor          $10
-                                 Creditor              $10
-        -----------------------------------------------------
-        July 23, 2023        Debtor          $5,000
-                                 Creditor              $5,000
-        -----------------------------------------------------
-        July 23, 2023        Debtor          $5,000
-                                 Creditor              $5,000
-        -----------------------------------------------------
-        July 23, 2023        Debtor          $5,000
-                                 Creditor              $5,000
-        -----------------------------------------------------
-        December 23, 2023    Debtor          $1
-                                 Creditor              $1
-        -----------------------------------------------------
-        ''')
+    assert out == _EXPECTED_LONG
 
     # New addition, test printing with account numbers
     j.print_journal(use_acc_numbers=True, use_acc_names=False)
     out, err = capsys.readouterr()
-    assert out == dedent('''\
-    Date                 Account          Debit     Credit
-    ======================================================
-    January 23, 2023     01-00-200        $10
-                             01-00-100              $10
-    ------------------------------------------------------
-    July 23, 2023        01-00-200        $5,000
-                             01-00-100              $5,000
-    ------------------------------------------------------
-    July 23, 2023        01-00-200        $5,000
-                             01-00-100              $5,000
-    ------------------------------------------------------
-    July 23, 2023        01-00-200        $5,000
-                             01-00-100              $5,000
-    ------------------------------------------------------
-    December 23, 2023    01-00-200        $1
-                             01-00-100              $1
-    ------------------------------------------------------
-    ''')
+    assert out == _EXPECTED_NUMBERS
 
 
     j.print_journal(use_acc_numbers=True, use_acc_names=True)
     out, err = capsys.readouterr()
-    assert out == dedent('''\
-    Date                 Account                   Debit     Credit
-    ===============================================================
-    January 23, 2023     01-00-200 Debtor          $10
-                             01-00-100 Creditor              $10
-    ---------------------------------------------------------------
-    July 23, 2023        01-00-200 Debtor          $5,000
-                             01-00-100 Creditor              $5,000
-    ---------------------------------------------------------------
-    July 23, 2023        01-00-200 Debtor          $5,000
-                             01-00-100 Creditor              $5,000
-    ---------------------------------------------------------------
-    July 23, 2023        01-00-200 Debtor          $5,000
-                             01-00-100 Creditor              $5,000
-    ---------------------------------------------------------------
-    December 23, 2023    01-00-200 Debtor          $1
-                             01-00-100 Creditor              $1
-    ---------------------------------------------------------------
-    ''')
+    assert out == _EXPECTED_NUMBERS_NAMES
     
 
+def test_print_journal_equal_amounts(capsys, cd_accounts):
+    '''
+    Amounts that are equal but written differently print as written
+    '''
+    acc_credit, acc_debit = cd_accounts
+    j = Journal()
+    for amount in (Decimal('5000'), Decimal('5000.00')):
+        j.add_entry(JournalEntry(datetime(2023, 7, 23), acc_debit, acc_credit,
+                                 amount))
+    j.print_journal()
+    out, err = capsys.readouterr()
+    assert out.count('$5,000.00') == 2
+    assert out.count('$5,000\n') == 2
+
+def test_print_journal_equal_dates(capsys, cd_accounts):
+    '''
+    The same instant in different time zones prints in its own zone
+    '''
+    acc_credit, acc_debit = cd_accounts
+    utc = datetime(2023, 7, 23, 12, tzinfo=timezone.utc)
+    est = utc.astimezone(timezone(timedelta(hours=-5), 'EST'))
+    j = Journal()
+    for date in (utc, est):
+        j.add_entry(JournalEntry(date, acc_debit, acc_credit, 10))
+    j.print_journal(date_format='%H:%M %Z')
+    out, err = capsys.readouterr()
+    assert '12:00 UTC' in out
+    assert '07:00 EST' in out
+
 def test_print_journal_with_memo(capsys):
     # TODO
     pass
 
-def test_wage_split():
+def test_wage_split(template):
     '''
     Test that I am able to faithfully split wages from a preset rule book
     '''
-    template = init_template()
-
     job_acc = Account('Company Pay', number='01-00-100',
                       account_type=AccountType.CREDIT, template=template)
     
@@ -258,7 +337,7 @@ def test_wage_split():
 
     # Test that pre-tax deductions totalling more than the original wages
     # throws error
-    error_wage_rules = deepcopy(wage_rules)
+    error_wage_rules = _clone_rules(wage_rules)
     error_wage_rules['PRE_TAX_DEDUCTIONS'].append(
         {
             'acc_credit': job_acc,
@@ -327,7 +406,7 @@ def test_wage_split():
     assert result[7].amount == 138.785 * 0.05
     assert result[8].amount == 138.785 * 0.15
 
-    error_wage_rules = deepcopy(wage_rules)
+    error_wage_rules = _clone_rules(wage_rules)
     error_wage_rules['POST_TAX_DEDUCTIONS'] = [
         {
             'acc_credit': gross_wages,
@@ -352,4 +431,72 @@ def test_wage_split():
     result = split_wages(wages, wage_rules)
     # 138.8 * 0.05 results in 6.940000000000001
     assert result[7].amount == truncate(138.8 * 0.05, 2)
-    assert result[8].amount == 138.8 * 0.15
\ No newline at end of file
+    assert result[8].amount == 138.8 * 0.15
+
+def test_wage_split_cache(wage_rules):
+    '''
+    Repeated splits with the same rules reuse the math but still post fresh
+    entries, and changing a rule is never served a stale split
+    '''
+    fed_acc = wage_rules['TAXES'][0]['acc_debit']
+
+    first = split_wages(100, wage_rules)
+    second = split_wages(100, wage_rules)
+    assert [e.amount for e in first] == [e.amount for e in second] == [100, 10]
+    assert all(a is not b for a, b in zip(first, second))
+    assert len(fed_acc.journal_entries) == 2
+
+    wage_rules['TAXES'][0]['amount'] = '20%'
+    assert split_wages(100, wage_rules)[1].amount == 20
+
+def test_wage_split_batch(wage_rules, template):
+    '''
+    A batch split gives every paycheck the same entries split_wages() would
+    '''
+    gross_wages = wage_rules['acc_debit']
+    ret_acc = Account('401k', number='10-00-101',
+                      account_type=AccountType.DEBIT, template=template)
+
+    wage_rules['round'] = True
+    wage_rules['PRE_TAX_DEDUCTIONS'].append(
+        {
+            'acc_credit': gross_wages,
+            'acc_debit': ret_acc,
+            'amount': '7.5%',
+            'memo': 'Retirement Contribution'
+        }
+    )
+    wage_rules['TAXES'][0]['amount'] = '15%'
+
+    wages = [100, 250.5, 100, 1234.56]
+    batch = split_wages_batch(wages, wage_rules)
+    assert len(batch) == len(wages)
+    for wage, entries in zip(wages, batch):
+        expected = split_wages(wage, wage_rules)
+        assert [e.amount for e in entries] == [e.amount for e in expected]
+        assert [e.acc_debit for e in entries] == \
+            [e.acc_debit for e in expected]
+
+    wage_rules['TAXES'][0]['amount'] = wages[-1] * 2
+    with pytest.raises(ValueError):
+        split_wages_batch(wages, wage_rules)
+
+@pytest.mark.parametrize('wages, amount, round_method, expected', [
+    # 30 * 0.06 is 1.7999999999999998 as a float
+    (30, '6%', 'Truncate', 1.8),
+    # 50 * 0.1699 lands just under 8.495
+    (50, '16.99%', 'Banker', 8.5),
+    (106.5, '5%', 'Banker', 5.32),
+    (106.5, '5%', 'Normal', 5.33),
+    (Decimal('106.5'), '5%', 'Normal', 5.33),
+])
+def test_wage_split_rounding_exact(wage_rules, wages, amount, round_method,
+                                   expected):
+    '''
+    Rounded splits are rounded from their exact decimal value, not from
+    whichever side of the cent the float product happened to land on
+    '''
+    wage_rules['round'] = True
+    wage_rules['round_method'] = round_method
+    wage_rules['TAXES'][0]['amount'] = amount
+    assert split_wages(wages, wage_rules)[1].amount == expected
@@ -1,22 +1,38 @@
 '''
 Basic fundamental functional tests of the ledger system
 '''
-import re
 from datetime import datetime
 
 import pytest
 
 from pybooks.ledger import GeneralLedger, SubLedger
 from pybooks.account import Account, AccountNumberSegment, \
-    AccountNumberTemplate
+    AccountNumberTemplate, ChartOfAccounts
 from pybooks.journal import Journal, JournalEntry
 from pybooks.enums import AccountType
 from pybooks.util import DuplicateException, InvalidAccountNumberException
 
-from util import init_template
+@pytest.fixture
+def filter_ledger(template):
+    '''
+    A general ledger holding the four accounts the filtering and balance
+    tests search over.  Returns (ledger, accounts)
+    '''
+    gen = GeneralLedger('general ledger', template)
+
+    accounts = (
+        Account('account 1', '10-02-200', AccountType.DEBIT, template=template),
+        Account('account 2', '10-00-300', AccountType.CREDIT,
+                template=template),
+        Account('account 3', '01-00-300', AccountType.DEBIT, template=template),
+        Account('account 4', '11-01-500', AccountType.CREDIT,
+                template=template),
+    )
+    gen.add_accounts(accounts)
+
+    return gen, accounts
 
-def test_init():
-    template = init_template()
+def test_init(template, single_digit_template):
     gen = GeneralLedger('general ledger', account_number_template=template)
     GeneralLedger('gen2', account_number_template=template,
                   accounting_method=None)
@@ -26,17 +42,12 @@ def test_init():
     with pytest.raises(ValueError):
         SubLedger('Cash3', account_number_template='some value')
 
-    seg1 = AccountNumberSegment('test', {re.compile(r'\d'): 'test'},
-                                is_regex=True)
-    template = AccountNumberTemplate(seg1)
-
-    gen = GeneralLedger('general', account_number_template=template)
+    gen = GeneralLedger('general',
+                        account_number_template=single_digit_template)
     sub = SubLedger('Cash', parent_ledger=gen)
     sub.add_account('test_account', '1', AccountType.CREDIT)
 
-def test_add_accounts():
-    template = init_template()
-
+def test_add_accounts(template):
     gen = GeneralLedger('general', template)
 
     account1 = Account('acc1', '01-01-101', AccountType.CREDIT,
@@ -74,6 +85,18 @@ def test_add_accounts():
     gen.add_account('raw acc', '01-02-101', AccountType.CREDIT)
     assert gen.accounts.get('01-02-101') is not None
 
+    # Bulk adds are all or nothing
+    with pytest.raises(DuplicateException):
+        gen.add_accounts((account2, account_dup2))
+    with pytest.raises(DuplicateException):
+        gen.add_accounts((account2, account3, account2))
+    assert '01-01-202' not in gen.accounts
+    assert '01-01-202' not in gen.chart_of_accounts
+
+    gen.add_accounts((account2, account3))
+    assert gen.accounts['01-01-202'] is account2
+    assert gen.chart_of_accounts['01-01-303'] is account3
+
     '''
     # Subledger section
     sub = SubLedger('Cash', general_ledger=gen)
@@ -86,22 +109,8 @@ def test_add_accounts():
     '''
     
 
-def test_filter_accounts():
-    template = init_template()
-
-    gen = GeneralLedger('general ledger', template)
-
-    acc1 = Account('account 1', '10-02-200', AccountType.DEBIT,
-                   template=template)
-    acc2 = Account('account 2', '10-00-300', AccountType.CREDIT,
-                   template=template)
-    acc3 = Account('account 3', '01-00-300', AccountType.DEBIT,
-                   template=template)
-    acc4 = Account('account 4', '11-01-500', AccountType.CREDIT,
-                   template=template)
-
-    for acc in (acc1, acc2, acc3, acc4):
-        gen.add_account(acc)
+def test_filter_accounts(filter_ledger):
+    gen, (acc1, acc2, acc3, acc4) = filter_ledger
 
     # Test no arguments
     assert gen.filter_accounts() == []
@@ -134,25 +143,21 @@ def test_filter_accounts():
                                company_code='01')
     assert results == [acc1, acc3]
 
-def test_filter_account__in():
+    # Matching several of the OR filters still only returns an account once
+    results = gen.filter_accounts(match_all=False, name='account 1',
+                                  company_code='10')
+    assert results == [acc1, acc2]
+
+    # New accounts are searchable straight away
+    gen.add_account('account 5', '10-01-100', AccountType.DEBIT)
+    acc5 = gen.accounts['10-01-100']
+    assert gen.filter_accounts(company_code='10') == [acc1, acc2, acc5]
+
+def test_filter_account__in(filter_ledger):
     '''
     Test the kw__in filter arg to filter_accounts
     '''
-    template = init_template()
-
-    gen = GeneralLedger('general ledger', template)
-
-    acc1 = Account('account 1', '10-02-200',  AccountType.DEBIT,
-                   template=template)
-    acc2 = Account('account 2', '10-00-300', AccountType.CREDIT,
-                   template=template)
-    acc3 = Account('account 3', '01-00-300', AccountType.DEBIT,
-                   template=template)
-    acc4 = Account('account 4', '11-01-500', AccountType.CREDIT,
-                   template=template)
-
-    for acc in (acc1, acc2, acc3, acc4):
-        gen.add_account(acc)
+    gen, (acc1, acc2, acc3, acc4) = filter_ledger
     
     results = gen.filter_accounts(name__in=['account 1', 'account 2'])
     assert results == [acc1, acc2]
@@ -160,22 +165,17 @@ def test_filter_account__in():
     results = gen.filter_accounts(department_code__in=['01', '00'])
     assert results == [acc2, acc3, acc4]
 
+    # Plain values are looked up in an index, which has to agree with the
+    # regex matching used for everything else
+    assert gen.filter_accounts(name__in=['ACCOUNT 4', 'account 3']) \
+        == [acc3, acc4]
+    assert gen.filter_accounts(name__in=['account [14]']) == [acc1, acc4]
+    assert gen.filter_accounts(name__in=['ACCOUNT 4'], fuzzy_match=False) == []
+    assert gen.filter_accounts(name__in=[]) == []
 
-def test_filter_account__lt_lte():
-    template = init_template()
-    gen = GeneralLedger('general ledger', template)
 
-    acc1 = Account('account 1', '10-02-200',  AccountType.DEBIT,
-                   template=template)
-    acc2 = Account('account 2', '10-00-300', AccountType.CREDIT,
-                   template=template)
-    acc3 = Account('account 3', '01-00-300', AccountType.DEBIT,
-                   template=template)
-    acc4 = Account('account 4', '11-01-500', AccountType.CREDIT,
-                   template=template)
-
-    for acc in (acc1, acc2, acc3, acc4):
-        gen.add_account(acc)
+def test_filter_account__lt_lte(filter_ledger):
+    gen, (acc1, acc2, acc3, acc4) = filter_ledger
     
     results = gen.filter_accounts(company_code__lt=11)
     assert results == [acc1, acc2, acc3]
@@ -185,21 +185,8 @@ def test_filter_account__lt_lte():
     
     assert gen.filter_accounts(company_code__lte=1) == [acc3]
 
-def test_filter_account__gt_gte():
-    template = init_template()
-    gen = GeneralLedger('general ledger', template)
-
-    acc1 = Account('account 1', '10-02-200',  AccountType.DEBIT,
-                   template=template)
-    acc2 = Account('account 2', '10-00-300', AccountType.CREDIT,
-                   template=template)
-    acc3 = Account('account 3', '01-00-300', AccountType.DEBIT,
-                   template=template)
-    acc4 = Account('account 4', '11-01-500', AccountType.CREDIT,
-                   template=template)
-
-    for acc in (acc1, acc2, acc3, acc4):
-        gen.add_account(acc)
+def test_filter_account__gt_gte(filter_ledger):
+    gen, (acc1, acc2, acc3, acc4) = filter_ledger
     
     results = gen.filter_accounts(company_code__gt=1)
     assert results == [acc1, acc2, acc4]
@@ -209,26 +196,12 @@ def test_filter_account__gt_gte():
     
     assert gen.filter_accounts(company_code__gte=1) == [acc1, acc2, acc3, acc4]
 
-def test_get_account():
+def test_get_account(filter_ledger):
     '''
     Make sure the API to get only a single account throws an error if more
     than 1 account is returned
     '''
-    template = init_template()
-
-    gen = GeneralLedger('general ledger', template)
-
-    acc1 = Account('account 1', '10-02-200', AccountType.DEBIT,
-                   template=template)
-    acc2 = Account('account 2', '10-00-300', AccountType.CREDIT,
-                   template=template)
-    acc3 = Account('account 3', '01-00-300', AccountType.DEBIT,
-                   template=template)
-    acc4 = Account('account 4', '11-01-500', AccountType.CREDIT,
-                   template=template)
-
-    for acc in (acc1, acc2, acc3, acc4):
-        gen.add_account(acc)
+    gen, (acc1, acc2, acc3, acc4) = filter_ledger
     
     assert gen.filter_accounts(account_code=500) == [acc4]
     # The returned value must be a single account, not an iterable
@@ -236,6 +209,7 @@ def test_get_account():
     assert gen.get_account(account_code=500) == acc4
 
     assert gen.get_account(account_code=123213) is None
+    assert gen.get_account(name='ACCOUNT 2') == acc2
 
     # Throw an error is multiple accounts are returned
     with pytest.raises(ValueError):
@@ -244,36 +218,22 @@ def test_get_account():
     # Searching for a non-existant filter returns None
     assert gen.get_account(account_filter=500) is None
 
-def test_get_net_balance():
+def test_get_net_balance(filter_ledger):
     '''
     define and test the API for aggregating balances for a subset of the
     ledger's accounts
     '''
-    template = init_template()
-
-    gen = GeneralLedger('general ledger', template)
-
-    acc1 = Account('account 1', '10-02-200', AccountType.DEBIT,
-                   template=template)
-    acc2 = Account('account 2', '10-00-300', AccountType.CREDIT,
-                   template=template)
-    acc3 = Account('account 3', '01-00-300', AccountType.DEBIT,
-                   template=template)
-    acc4 = Account('account 4', '11-01-500', AccountType.CREDIT,
-                   template=template)
-
-    for acc in (acc1, acc2, acc3, acc4):
-        gen.add_account(acc)
+    gen, (acc1, acc2, acc3, acc4) = filter_ledger
     
     j = Journal()
 
     # Debit acc1 $5000 from acc2
     # Debit acc3 $10000 from acc4
-    for _ in range(10):
-        je = JournalEntry(datetime.now(), acc1, acc2, 500)
-        j.add_entry(je)
-        je = JournalEntry(datetime.now(), acc3, acc4, 1000)
-        j.add_entry(je)
+    now = datetime.now()
+    j.add_entries(
+        [JournalEntry(now, acc1, acc2, 500) for _ in range(10)]
+        + [JournalEntry(now, acc3, acc4, 1000) for _ in range(10)]
+    )
 
     # When netting credits and debits, the balance should cancel
     result = gen.get_net_balance(name__in=['account 1', 'account 2'],
@@ -325,13 +285,11 @@ def test_get_net_balance():
     assert result == -15000
 
 
-def test_compare_chart_of_accounts():
+def test_compare_chart_of_accounts(template):
     '''
     I am running into an issue where two charts of accounts from two separate
     general ledgers with identical accounts are failing the equality check
     '''
-    template = init_template()
-
     gen = GeneralLedger('general ledger', account_number_template=template)
     gen2 = GeneralLedger('gen ledger 2', account_number_template=template)
 
@@ -340,9 +298,8 @@ def test_compare_chart_of_accounts():
     acc3 = Account('acc3', '01-00-300', AccountType.DEBIT, template=template)
     acc4 = Account('acc4', '11-01-500', AccountType.CREDIT, template=template)
 
-    for acc in (acc1, acc2, acc3, acc4):
-        gen.add_account(acc)
-        gen2.add_account(acc)
+    gen.add_accounts((acc1, acc2, acc3, acc4))
+    gen2.add_accounts((acc1, acc2, acc3, acc4))
 
     assert gen.chart_of_accounts == gen2.chart_of_accounts
 
@@ -354,17 +311,25 @@ def test_compare_chart_of_accounts():
 
     assert gen.chart_of_accounts != gen2.chart_of_accounts
 
+    # Accounts edited in place are compared as they are now
+    cash = Account('Cash', '10-02-100', AccountType.DEBIT, template=template)
+    bank = Account('Bank', '10-02-100', AccountType.DEBIT, template=template)
+    chart1 = ChartOfAccounts(template, {cash.number: cash})
+    chart2 = ChartOfAccounts(template, {bank.number: bank})
+    assert chart1 != chart2
+    cash.name = 'Bank'
+    assert chart1 == chart2
+
 def test_view():
     pass
 
 # TODO add other tests for other views and ratios of a ledger
 
-def test_control_accounts():
+def test_control_accounts(template):
     '''
     Now that I am expanding with the concept of control accounts, I need to
     lay the groundwork for how they should function
     '''
-    template = init_template()
     gen = GeneralLedger(name='gen', account_number_template=template)
     ac1 = template.make_account(name='asset control',
                                 account_type=AccountType.DEBIT,
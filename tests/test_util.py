@@ -1,16 +1,19 @@
 from datetime import datetime
+import math
 
 import pytest
 
 from pybooks.util import parse_date, truncate, normal_round,\
-    calculate_progressive_tax
+    calculate_progressive_tax, calculate_progressive_tax_batch, \
+    compile_progressive_tax
 
 # Taking this out for now, good attempt, but I don't know if this belongs here
 
-def test_parse_date():
-    test_date = datetime(2023, 7, 23, 0, 0, 0)
+# The date every test_parse_date string spells out
+_TEST_DATE = datetime(2023, 7, 23, 0, 0, 0)
 
-    assert parse_date('2023$07$23', '%Y$%m$%d') == test_date
+def test_parse_date():
+    assert parse_date('2023$07$23', '%Y$%m$%d') == _TEST_DATE
 
     invalid_dates = (
         'x',
@@ -28,70 +31,147 @@ def test_parse_date():
         '00:00:00 Sunday-Jul,23 2023',
     )
     for date in valid_dates:
-        assert parse_date(date) == test_date
-
-def test_truncate():
-    assert truncate(23.9, 0) == 23
-    assert truncate(23.5, 0) == 23
-    assert truncate(23.2, 0) == 23
-
-    assert truncate(23.564, 2) == 23.56
-    assert truncate(23.549, 2) == 23.54
-
-def test_normal_round():
-    assert normal_round(23.6, 0) == 24
-    assert normal_round(23.5, 0) == 24
-    assert normal_round(23.4, 0) == 23
-
-    assert normal_round(23.48, 1) == 23.5
-    assert normal_round(23.45, 1) == 23.5
-    assert normal_round(23.43, 1) == 23.4
-
-    assert normal_round(23.457, 2) == 23.46
-    assert normal_round(23.455, 2) == 23.46
-    assert normal_round(23.451, 2) == 23.45
-
-
-def test_calculate_income_tax():
-    tax_brackets = [
-        (0.01, 100),
-        (0.02, 200),
-    ]
-
-    assert calculate_progressive_tax(50, tax_brackets) == 0.50
-    assert calculate_progressive_tax(150, tax_brackets) == 1 + 0.02 * 50
-    assert calculate_progressive_tax(200, tax_brackets) == 3
-
+        assert parse_date(date) == _TEST_DATE
+
+    # Dates of the same shape reuse the format found for the first one, make
+    # sure that neither changes the answer nor hides out of range values
+    assert parse_date('Mon July 24, 2023') == datetime(2023, 7, 24)
+    assert parse_date('2023/07/23') == _TEST_DATE
+    assert parse_date('2023/07/24') == datetime(2023, 7, 24)
+    assert parse_date('2023/13/24') is None
+
+    # Repeated strings come straight back from the cache
+    assert parse_date('2023/07/23') is parse_date('2023/07/23')
+
+    # Time zone suffixes
+    assert parse_date('2023/07/23 13:25 UTC') == datetime(2023, 7, 23, 13, 25)
+
+def test_parse_date_shape_cache():
+    '''
+    Date shapes in use stay cached while new ones push out the oldest
+    '''
+    parse_date.cache_clear()
+    parse_date('2023/07/23')
+    maxsize = parse_date.shape_cache_info().maxsize
+    for spaces in range(maxsize):
+        # A new string each time, the same one would never reach the shapes
+        parse_date(f'{1000 + spaces}/07/23')
+        # Any run of spaces is a ' ' separator, but a new shape
+        assert parse_date('2023/07' + ' ' * (spaces + 1) + '23') == _TEST_DATE
+    info = parse_date.shape_cache_info()
+    assert info.hits == maxsize
+    assert info.misses == maxsize + 1
+    assert info.currsize == maxsize
+
+    assert parse_date('1999/07/23') == datetime(1999, 7, 23)
+    assert parse_date.shape_cache_info().hits == info.hits + 1
+    # The first spaced shape was pushed out
+    assert parse_date('1999/07 23') == datetime(1999, 7, 23)
+    assert parse_date.shape_cache_info().misses == info.misses + 1
+
+@pytest.mark.parametrize('num, decimals, expected', [
+    (23.9, 0, 23),
+    (23.5, 0, 23),
+    (23.2, 0, 23),
+    (23.564, 2, 23.56),
+    (23.549, 2, 23.54),
+    (-23.564, 2, -23.56),
+    (1.5e-05, 2, 0),
+])
+def test_truncate(num, decimals, expected):
+    assert truncate(num, decimals) == expected
+
+@pytest.mark.parametrize('num, decimals, expected', [
+    (23.6, 0, 24),
+    (23.5, 0, 24),
+    (23.4, 0, 23),
+    (23.48, 1, 23.5),
+    (23.45, 1, 23.5),
+    (23.43, 1, 23.4),
+    (23.457, 2, 23.46),
+    (23.455, 2, 23.46),
+    (23.451, 2, 23.45),
+    # Fewer digits than asked for, carries and whole numbers
+    (23.4, 2, 23.4),
+    (23.46, 2, 23.46),
+    (23.96, 1, 24),
+    (23, 1, 23),
+    (-23.6, 0, -24),
+])
+def test_normal_round(num, decimals, expected):
+    assert normal_round(num, decimals) == expected
+
+@pytest.mark.parametrize('num', [math.inf, -math.inf, 1e300, -1.5e300])
+def test_rounding_extremes(num):
+    assert truncate(num, 2) == num
+    assert normal_round(num, 2) == num
+
+def test_rounding_nan():
+    assert math.isnan(truncate(math.nan, 2))
+    assert math.isnan(normal_round(math.nan, 2))
+
+
+# (rate, max income) brackets shared by the tax tests
+_SIMPLE_BRACKETS = (
+    (0.01, 100),
+    (0.02, 200),
+)
+_UNCAPPED_BRACKETS = _SIMPLE_BRACKETS + ((0.5, 'inf'),)
+# Real us tax brackets ('23)
+_US_2023_BRACKETS = (
+    (0.1, 11_000),
+    (0.12, 44_725),
+    (0.22, 95_375),
+    (0.24, 182_100),
+    (0.32, 231_250),
+    (0.35, 578_125),
+    (0.37, 'inf')
+)
+
+@pytest.mark.parametrize('income, tax_brackets, expected', [
+    (50, _SIMPLE_BRACKETS, 0.50),
+    (150, _SIMPLE_BRACKETS, 1 + 0.02 * 50),
+    (200, _SIMPLE_BRACKETS, 3),
     # Fraction test
-    assert calculate_progressive_tax(100.50, tax_brackets) == 1 + 0.01
+    (100.50, _SIMPLE_BRACKETS, 1 + 0.01),
+    (1000, _UNCAPPED_BRACKETS, 3 + 0.5 * 800),
+    (1_000_000, _UNCAPPED_BRACKETS, 3 + 0.5 * (1_000_000 - 200)),
+    (15_000, _US_2023_BRACKETS, 1100 + 0.12 * 4_000),
+    (50_000, _US_2023_BRACKETS, 1100 + 4047 + 0.22 * (50_000 - 44_725)),
+    (1_000_000, _US_2023_BRACKETS, 174_238.25 + 0.37 * (1_000_000 - 578_125)),
+])
+def test_calculate_income_tax(income, tax_brackets, expected):
+    assert calculate_progressive_tax(income, list(tax_brackets)) == expected
+    assert compile_progressive_tax(tax_brackets)(income) == expected
+
+def test_calculate_income_tax_errors():
+    tax_brackets = list(_SIMPLE_BRACKETS)
 
     with pytest.raises(ValueError):
         calculate_progressive_tax(1000000, tax_brackets)
-    
-    tax_brackets.append((0.5, 'inf'))
+    assert calculate_progressive_tax(1000000, tax_brackets, strict=False) \
+        is None
 
-    assert calculate_progressive_tax(1000, tax_brackets) == \
-        3 + 0.5 * 800
-    
-    assert calculate_progressive_tax(1_000_000, tax_brackets) == \
+    # Brackets added later are picked up
+    tax_brackets.append((0.5, 'inf'))
+    assert calculate_progressive_tax(1000000, tax_brackets) == \
         3 + 0.5 * (1_000_000 - 200)
 
-    # Now testing with real us tax brackets ('23)
-    tax_brackets = [
-        (0.1, 11_000),
-        (0.12, 44_725),
-        (0.22, 95_375),
-        (0.24, 182_100),
-        (0.32, 231_250),
-        (0.35, 578_125),
-        (0.37, 'inf')
-    ]
-
-    assert calculate_progressive_tax(15_000, tax_brackets) == 1100 + 0.12 * 4_000
-    assert calculate_progressive_tax(50_000, tax_brackets) == \
-        1100 + 4047 + 0.22 * (50_000 - 44_725)
-    
-    assert calculate_progressive_tax(1_000_000, tax_brackets) == \
-        174_238.25 + 0.37 * (1_000_000 - 578_125)
+    with pytest.raises(SyntaxError):
+        calculate_progressive_tax(1000, [(0.1, 100), (0.2, 50)])
 
+    tax = compile_progressive_tax(_SIMPLE_BRACKETS, strict=False)
+    assert tax(1000000) is None
+    with pytest.raises(ValueError):
+        compile_progressive_tax(_SIMPLE_BRACKETS)(1000000)
 
+def test_calculate_income_tax_batch():
+    incomes = [15_000, 50_000, 0, 1_000_000, 50_000]
+    assert calculate_progressive_tax_batch(incomes, _US_2023_BRACKETS) == [
+        calculate_progressive_tax(income, _US_2023_BRACKETS)
+        for income in incomes
+    ]
+    with pytest.raises(ValueError):
+        calculate_progressive_tax_batch([10, 1000], [(0.1, 100)])
+    assert calculate_progressive_tax_batch([10, 1000], [(0.1, 100)],
+                                           strict=False) == [1, None]
@@ -4,38 +4,51 @@ Common patterns needed in many separate tests
 
 
 import re
-
-from pybooks.account import AccountNumberSegment, AccountNumberTemplate
-
+from functools import lru_cache
+from itertools import chain
+
+from pybooks.account import AccountNumberSegment, AccountNumberTemplate, \
+    _AccountNumber
+
+# Segments hold no per-template state, so every template built by
+# init_template() can share the same Account Code segment
+_ACCOUNT_CODE_SEGMENT = AccountNumberSegment('Account Code', {
+    re.compile(r'1\d\d'): 'Assets',
+    re.compile(r'2\d\d'): 'Liabilities',
+    re.compile(r'3\d\d'): 'Equity',
+    re.compile(r'4\d\d'): 'Revenue',
+    re.compile(r'5\d\d'): 'Expenses',
+}, is_regex=True)
+
+# Company and Department Code values, segments only ever read these
+_SEG1_VALS = {
+    f'{num:02}': f'cmpny{num}' for num in chain(range(1, 4), range(10, 15))
+}
+_SEG2_VALS = {f'{num:02}': f'dpt{num}' for num in range(3)}
+
+@lru_cache(maxsize=1)
 def init_template():
     '''
     Reusable test code, template format
 
     01-02-100
+
+    Templates are never changed once built, so every caller shares the same
+    one
+    '''
+    seg1 = AccountNumberSegment('Company Code', _SEG1_VALS)
+    seg2 = AccountNumberSegment('Department Code', _SEG2_VALS)
+
+    template = AccountNumberTemplate(seg1, seg2, _ACCOUNT_CODE_SEGMENT)
+
+    return template
+
+@lru_cache(maxsize=256)
+def make_account_number(number, template):
+    '''
+    Cached _AccountNumber construction so tests that keep rebuilding the same
+    number against the same template only validate it once.
+
+    Templates hash by identity, so each template gets its own cache entries.
     '''
-    seg1_vals = {
-        f'{num:02}': f'cmpny{num}'
-        for num in range(1, 4)
-    }
-    seg1_vals.update({
-        f'{num:02}': f'cmpny{num}'
-        for num in range(10, 15)
-    })
-
-    seg1 = AccountNumberSegment('Company Code', seg1_vals)
-    seg2 = AccountNumberSegment('Department Code', {
-        f'{num:02}': f'dpt{num}'
-        for num in range(3)
-    })
-
-    seg3 = AccountNumberSegment('Account Code', {
-        re.compile(r'1\d\d'): 'Assets',
-        re.compile(r'2\d\d'): 'Liabilities',
-        re.compile(r'3\d\d'): 'Equity',
-        re.compile(r'4\d\d'): 'Revenue',
-        re.compile(r'5\d\d'): 'Expenses',
-    }, is_regex=True)
-
-    template = AccountNumberTemplate(seg1, seg2, seg3)
-
-    return template
\ No newline at end of file
+    return _AccountNumber(number, template)